@@ -0,0 +1,5 @@
+set -o pipefail
+
+CWD="${PWD}"
+
+python3 -m benchmarks.run_benchmarks "$@" | tee "$CWD/bench_output.txt"
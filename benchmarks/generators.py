@@ -0,0 +1,105 @@
+import numpy as np
+
+# seed of the random generators, so that the synthetic data sets are the same from one run to the next
+SEED = 0
+
+
+def make_profile(n_points=2000, length=5000., seed=SEED):
+    """ generates the known points of a topographic profile (x starting at 0 and strictly increasing, z wavy)
+
+    :param n_points: number of known points
+    :type n_points: int
+    :param length: horizontal length of the profile
+    :type length: float
+    :return: array of shape (n_points, 2) of x, z coordinates
+    :rtype: numpy.array
+    """
+
+    rng = np.random.default_rng(seed)
+    x = np.hstack([0., np.cumsum(rng.uniform(0.5, 1.5, n_points - 1))])
+    x *= length / x[-1]
+    z = 200. + 20. * np.sin(x / 300.) + np.cumsum(rng.normal(0., 0.2, n_points))
+    return np.column_stack([x, z])
+
+
+def make_ddmm(n_angles=1000000, seed=SEED):
+    """ generates angles expressed as degrees and minutes (DDDMM.MMMM)
+
+    :param n_angles: number of angles
+    :type n_angles: int
+    :return: angles
+    :rtype: numpy.array
+    """
+
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 180, n_angles) * 100. + rng.uniform(0., 60., n_angles)
+
+
+def make_points(n_points=1000000, extent=10000., seed=SEED):
+    """ generates random points in a square
+
+    :param n_points: number of points
+    :type n_points: int
+    :param extent: size of the square
+    :type extent: float
+    :return: array of shape (n_points, 2) of x, y coordinates
+    :rtype: numpy.array
+    """
+
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0., extent, (n_points, 2))
+
+
+def make_geojson(n_features=200000, seed=SEED):
+    """ generates a geojson feature collection of GPS track points, as exported from a GPS log
+
+    :param n_features: number of point features
+    :type n_features: int
+    :return: geojson dictionary
+    :rtype: dict
+    """
+
+    rng = np.random.default_rng(seed)
+    lonlat = np.column_stack([5.18 + np.cumsum(rng.normal(0., 1e-5, n_features)),
+                              50.14 + np.cumsum(rng.normal(0., 1e-5, n_features))]).tolist()
+    elevations = rng.uniform(190., 230., n_features).tolist()
+    return {'type': 'FeatureCollection',
+            'crs': {'type': 'name', 'properties': {'name': 'urn:ogc:def:crs:OGC:1.3:CRS84'}},
+            'features': [{'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': c},
+                          'properties': {'ele': e, 'track_fid': 0, 'track_seg_point_id': i}}
+                         for i, (c, e) in enumerate(zip(lonlat, elevations))]}
+
+
+def make_lines(n_lines=1000, seed=SEED):
+    """ generates straight survey lines
+
+    :param n_lines: number of lines
+    :type n_lines: int
+    :return: list of tuples (x_start, y_start, x_end, y_end)
+    :rtype: list
+    """
+
+    rng = np.random.default_rng(seed)
+    return [tuple(e) for e in rng.uniform(0., 1000., (n_lines, 4))]
+
+
+def make_vtk(filename, shape=(200, 200, 25), binary=True):
+    """ writes the mesh of a 2D section extruded across the profile (x along the profile, z elevation) as a legacy
+    vtk unstructured grid with a point field
+
+    :param filename: name of the vtk file
+    :type filename: str
+    :param shape: number of points along x, y and z
+    :type shape: tuple
+    :param binary: if True the file is written in binary, otherwise in ascii
+    :type binary: bool
+    :return: number of points of the mesh
+    :rtype: int
+    """
+
+    import pyvista as pv
+
+    grid = pv.ImageData(dimensions=shape, spacing=(1., 0.1, 0.5), origin=(0., -1., 150.)).cast_to_unstructured_grid()
+    grid.point_data['rho'] = np.linspace(10., 1000., grid.n_points)
+    grid.save(filename, binary=binary)
+    return grid.n_points
@@ -0,0 +1,343 @@
+""" Benchmarks of the hot paths of utils.topo on synthetic data sets of realistic sizes
+
+Each benchmark is timed (median of several runs, each running for tens of milliseconds at least) and its peak memory is
+measured with tracemalloc, or as the peak resident set size of a separate process for the benchmarks whose memory is
+allocated by C++ libraries (VTK) that tracemalloc does not see. The results are compared with the baselines stored in
+baselines.json, the run fails if a benchmark is slower or uses more memory than its baseline by more than a threshold.
+The times are compared relative to a calibration loop timed along with the benchmarks, so that a machine that is
+uniformly slower or busier than when the baselines were recorded does not fail the run. Baselines still depend on the
+machine: record them with --update before comparing.
+
+Usage (from the project directory):
+
+    python -m benchmarks.run_benchmarks [--update] [--threshold 0.5] [--memory-threshold 0.1] [--only azimuth]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from benchmarks import generators as gen
+from utils.topo import profile as pf
+from utils.topo import topo
+from utils.topo import coordinates
+from utils.topo import geometry
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+# relative increase of the time (normalised by the calibration loop) and of the peak memory over the baselines
+# considered as a regression
+TIME_THRESHOLD = 0.5
+MEMORY_THRESHOLD = 0.10
+# differences of peak memory below this number of bytes are not considered as regressions (allocator noise)
+MEMORY_SLACK = 1 << 20
+# number of timed runs of each benchmark, their median is compared with the baselines
+REPEAT = 9
+
+BENCHMARKS = {}
+# benchmarks whose peak memory is measured as the peak resident set size of a separate process
+RSS_BENCHMARKS = set()
+
+
+def benchmark(name, rss=False):
+    """ registers a benchmark: a function preparing the data, that returns the function to measure and optionally a
+    function to call before each run (e.g. to clear a cache)
+
+    :param name: name of the benchmark
+    :type name: str
+    :param rss: if True the peak memory is measured as the peak resident set size of a separate process (for memory
+        allocated outside of python), the setup function must then reuse the files it already wrote in the directory
+    :type rss: bool
+    """
+
+    def register(setup):
+        BENCHMARKS[name] = setup
+        if rss:
+            RSS_BENCHMARKS.add(name)
+        return setup
+    return register
+
+
+def _clear_profile_cache():
+    pf._profile_curves.clear()
+
+
+@benchmark('cclength2xz')
+def bench_cclength2xz(tmp):
+    profiles = [gen.make_profile(2000, seed=seed) for seed in range(10)]
+    distances = [np.linspace(0., pf.cclengths(p)[-1], 20000) for p in profiles]
+    return lambda: [pf.cclength2xz(p, d) for p, d in zip(profiles, distances)], _clear_profile_cache
+
+
+@benchmark('cclengths')
+def bench_cclengths(tmp):
+    profiles = [gen.make_profile(2000, seed=seed) for seed in range(200)]
+    return lambda: [pf.cclengths(p) for p in profiles], _clear_profile_cache
+
+
+@benchmark('ddmm_to_dd')
+def bench_ddmm_to_dd(tmp):
+    angles = gen.make_ddmm(5000000)
+    return lambda: topo.ddmm_to_dd(angles), None
+
+
+@benchmark('azimuth')
+def bench_azimuth(tmp):
+    origins = gen.make_points(4000000, seed=1)
+    targets = gen.make_points(4000000, seed=2)
+    return lambda: topo.azimuth(origins, targets), None
+
+
+@benchmark('flip_geojson_coordinates')
+def bench_flip_geojson_coordinates(tmp):
+    gjsn = gen.make_geojson(200000)
+    # flipping twice restores the coordinates, each run works on the same data
+    return lambda: coordinates.flip_geojson_coordinates(gjsn), None
+
+
+@benchmark('transform_matrix_2d')
+def bench_transform_matrix_2d(tmp):
+    lines = gen.make_lines(5000)
+    to_line = (100., 200., 300., 400.)
+    return lambda: [geometry.transform_matrix_2d(line, to_line) for line in lines], None
+
+
+@benchmark('transform_vtk', rss=True)
+def bench_transform_vtk(tmp):
+    infile = os.path.join(tmp, 'section.vtk')
+    if not os.path.exists(infile):
+        gen.make_vtk(infile)
+    m = geometry.transform_matrix_2d((0., 0., 200., 0.), (1000., 2000., 1120., 2160.))
+    return lambda: geometry.transform_vtk(m, infile, os.path.join(tmp, 'section_3D.vtk')), None
+
+
+@benchmark('transform_vtk_chunked', rss=True)
+def bench_transform_vtk_chunked(tmp):
+    infile = os.path.join(tmp, 'section.vtk')
+    if not os.path.exists(infile):
+        gen.make_vtk(infile)
+    m = geometry.transform_matrix_2d((0., 0., 200., 0.), (1000., 2000., 1120., 2160.))
+    return lambda: geometry.transform_vtk(m, infile, os.path.join(tmp, 'section_3D.vtk'), chunk_size=1 << 16), None
+
+
+def calibration():
+    """ prepares the calibration loop, a fixed mix of numpy and interpreter work whose time tracks the speed of the
+    machine at the time of the run
+
+    :return: function to measure
+    :rtype: function
+    """
+
+    values = np.random.default_rng(0).random(1 << 20)
+
+    def run():
+        np.sort(values)
+        np.cumsum(values)
+        sum(i * i for i in range(200000))
+    return run
+
+
+def median_time(run, before=None, repeat=REPEAT):
+    """ measures the median time of several runs of a function, after a warm-up run that is not timed (imports, caches
+    of numpy and of the operating system)
+
+    :param run: function to measure
+    :type run: function
+    :param before: function called before each run, not measured
+    :type before: function
+    :param repeat: number of timed runs
+    :type repeat: int
+    :return: median time in seconds
+    :rtype: float
+    """
+
+    if before is not None:
+        before()
+    run()
+    times = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def peak_rss(name, tmp):
+    """ measures the increase of the peak resident set size of a new process during a run of a benchmark
+
+    :param name: name of the benchmark
+    :type name: str
+    :param tmp: directory where the setup of the benchmark already wrote its files
+    :type tmp: str
+    :return: increase of the peak resident set size in bytes
+    :rtype: int
+    """
+
+    out = subprocess.run([sys.executable, '-m', 'benchmarks.run_benchmarks', '--rss-child', name, tmp],
+                         check=True, capture_output=True, text=True).stdout
+    return int(out.split()[-1])
+
+
+def _max_rss():
+    # on linux ru_maxrss of a new process starts at the resident set size of its parent when it was spawned, the peak
+    # of the process itself is read from /proc
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes, except on macos
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _rss_child(name, tmp):
+    run, before = BENCHMARKS[name](tmp)
+    if before is not None:
+        before()
+    start = _max_rss()
+    run()
+    print(_max_rss() - start)
+
+
+def measure(run, before=None, repeat=REPEAT):
+    """ measures the median time of several runs of a function and its peak memory
+
+    :param run: function to measure
+    :type run: function
+    :param before: function called before each run, not measured
+    :type before: function
+    :param repeat: number of timed runs
+    :type repeat: int
+    :return: median time in seconds and peak memory in bytes
+    :rtype: dict
+    """
+
+    t = median_time(run, before, repeat)
+    # memory is measured in a separate run, tracemalloc slows down the allocations
+    if before is not None:
+        before()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'time': t, 'peak_memory': peak}
+
+
+def compare(results, baselines, threshold=TIME_THRESHOLD, memory_threshold=MEMORY_THRESHOLD, scale=1.):
+    """ compares results with baselines
+
+    :param results: results of the benchmarks, by name
+    :type results: dict
+    :param baselines: baselines of the benchmarks, by name
+    :type baselines: dict
+    :param threshold: relative increase of the time considered as a regression
+    :type threshold: float
+    :param memory_threshold: relative increase of the peak memory considered as a regression
+    :type memory_threshold: float
+    :param scale: time of the calibration loop divided by its time when the baselines were recorded, the times of the
+        baselines are multiplied by it
+    :type scale: float
+    :return: descriptions of the regressions
+    :rtype: list
+    """
+
+    regressions = []
+    for name, result in results.items():
+        if name not in baselines:
+            continue
+        for key, limit in (('time', threshold), ('peak_memory', memory_threshold), ('peak_rss', memory_threshold)):
+            if key not in result or key not in baselines[name]:
+                continue
+            baseline = baselines[name][key] * (scale if key == 'time' else 1.)
+            ratio = result[key] / max(baseline, 1e-12)
+            if key != 'time' and result[key] - baseline < MEMORY_SLACK:
+                continue
+            if ratio > 1. + limit:
+                regressions.append('%s: %s is %.2f times the baseline (limit %.2f)' % (name, key, ratio, 1. + limit))
+    return regressions
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ['--rss-child']:
+        _rss_child(*argv[1:3])
+        return 0
+    parser = argparse.ArgumentParser(description='Runs the benchmarks of utils.topo and compares them with baselines.')
+    parser.add_argument('--baselines', default=BASELINES, help='json file of the baselines')
+    parser.add_argument('--update', action='store_true', help='stores the results as the new baselines')
+    parser.add_argument('--threshold', type=float, default=TIME_THRESHOLD,
+                        help='relative increase of the time considered as a regression')
+    parser.add_argument('--memory-threshold', type=float, default=MEMORY_THRESHOLD,
+                        help='relative increase of the peak memory considered as a regression')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='number of timed runs of each benchmark')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--output', help='json file where the results are written')
+    args = parser.parse_args(argv)
+
+    baselines, baseline_calibration = {}, None
+    if os.path.exists(args.baselines):
+        with open(args.baselines, 'r') as f:
+            stored = json.load(f)
+        baselines, baseline_calibration = stored['benchmarks'], stored['machine'].get('calibration')
+
+    calibration_time = median_time(calibration(), repeat=args.repeat)
+    scale = 1. if baseline_calibration is None else calibration_time / baseline_calibration
+    print('%-26s %10.4f s   (x%.2f of the baselines machine)' % ('calibration', calibration_time, scale))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.only or BENCHMARKS:
+            try:
+                run, before = BENCHMARKS[name](tmp)
+            except ImportError as e:
+                print('%-26s skipped (%s)' % (name, e))
+                continue
+            if name in RSS_BENCHMARKS:
+                results[name] = {'time': median_time(run, before, repeat=args.repeat), 'peak_rss': peak_rss(name, tmp)}
+            else:
+                results[name] = measure(run, before, repeat=args.repeat)
+            memory = results[name].get('peak_memory', results[name].get('peak_rss'))
+            line = '%-26s %10.4f s %10.1f MB' % (name, results[name]['time'], memory / 2 ** 20)
+            if name in baselines:
+                baseline = baselines[name].get('peak_memory', baselines[name].get('peak_rss'))
+                line += '   (baseline %.4f s %.1f MB)' % (baselines[name]['time'], baseline / 2 ** 20)
+            print(line)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.update:
+        if args.only and baseline_calibration is not None:
+            # the other baselines are kept, the new times are expressed relative to their calibration
+            for result in results.values():
+                result['time'] /= scale
+            calibration_time = baseline_calibration
+        baselines.update(results)
+        with open(args.baselines, 'w') as f:
+            json.dump({'machine': {'python': platform.python_version(), 'numpy': np.__version__,
+                                   'platform': platform.platform(), 'processor': platform.machine(),
+                                   'calibration': calibration_time},
+                       'benchmarks': baselines}, f, indent=1)
+        print('Baselines written to %s' % args.baselines)
+        return 0
+
+    regressions = compare(results, baselines, args.threshold, args.memory_threshold, scale)
+    for regression in regressions:
+        print('REGRESSION ' + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
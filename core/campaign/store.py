@@ -0,0 +1,163 @@
+import json
+import os
+import numpy as np
+from core.campaign.survey import Survey, Campaign
+
+MANIFEST = 'manifest.json'
+STORE_VERSION = 1
+
+
+class CampaignStore:
+    """
+    Columnar on-disk store of the surveys of a campaign
+
+    Each survey line is stored in its own directory, with one raw binary file per column. A small json manifest holds
+    the name, number of readings and dtypes of the columns of each line. Columns are opened as read-only memory maps,
+    so that only the parts of the files actually used are read from the disk. Readings are appended to the lines,
+    e.g. for each new acquisition day, the manifest being updated once the columns are written.
+
+    Attributes
+    -----------
+    path : str
+        directory of the store
+    manifest : dict
+    """
+
+    def __init__(self, path, name=None):
+        """
+        Opens a campaign store, creating it if it does not exist
+
+        Parameters
+        -----------
+        path : str
+            directory of the store
+        name : str
+            name of the campaign (only used when the store is created)
+        """
+
+        self.path = path
+        manifest_file = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r') as f:
+                self.manifest = json.load(f)
+            if self.manifest.get('version') != STORE_VERSION:
+                raise ValueError('Unsupported campaign store version %s.' % self.manifest.get('version'))
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.manifest = {'version': STORE_VERSION, 'name': name, 'lines': {}}
+            self._save_manifest()
+
+    def _save_manifest(self):
+        tmp_file = os.path.join(self.path, MANIFEST + '.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp_file, os.path.join(self.path, MANIFEST))
+
+    def _column_file(self, line, column):
+        return os.path.join(self.path, self.manifest['lines'][line]['directory'], column + '.bin')
+
+    @property
+    def lines(self):
+        """ names of the survey lines """
+        return list(self.manifest['lines'])
+
+    def __len__(self):
+        return len(self.manifest['lines'])
+
+    def append(self, survey):
+        """
+        Appends the readings of a survey to its line, the line is created if it is not yet in the store
+
+        Parameters
+        -----------
+        survey : Survey
+            survey whose name is the line name, its readings must not be older than those already stored for the line
+            and it must have the same channels
+        """
+
+        if not isinstance(survey.name, str):
+            raise ValueError('Surveys must be named to be stored.')
+        lines = self.manifest['lines']
+        if survey.name not in lines:
+            directory = 'line_%04d' % len(lines)
+            os.makedirs(os.path.join(self.path, directory), exist_ok=True)
+            lines[survey.name] = {'directory': directory, 'length': 0,
+                                  'columns': {k: v.dtype.str for k, v in survey.columns.items()}}
+        line = lines[survey.name]
+        if set(line['columns']) != set(survey.columns):
+            raise ValueError('Columns of line %s are %s.' % (survey.name, sorted(line['columns'])))
+        if len(survey) == 0:
+            return
+        n = line['length']
+        if n > 0 and survey.times[0] < self.survey(survey.name, columns=[]).times[-1]:
+            raise ValueError('Readings older than those of line %s cannot be appended.' % survey.name)
+
+        for column, dtype in line['columns'].items():
+            dtype = np.dtype(dtype)
+            with open(self._column_file(survey.name, column), 'ab') as f:
+                # drop anything written after the last complete append
+                f.truncate(n * dtype.itemsize)
+                f.write(np.ascontiguousarray(survey.columns[column], dtype=dtype).tobytes())
+        line['length'] = n + len(survey)
+        self._save_manifest()
+
+    def write(self, campaign):
+        """
+        Appends the readings of all the surveys of a campaign
+
+        Parameters
+        -----------
+        campaign : Campaign
+        """
+
+        for survey in campaign:
+            self.append(survey)
+
+    def survey(self, line, columns=None):
+        """
+        Opens the columns of a survey line as read-only memory maps
+
+        Parameters
+        -----------
+        line : str
+            name of the line
+        columns : list
+            names of the columns to open in addition to time (default: all)
+
+        Returns
+        -------
+        survey : Survey
+        """
+
+        info = self.manifest['lines'][line]
+        n = info['length']
+        if columns is None:
+            columns = list(info['columns'])
+        arrays = {}
+        for column in ['time'] + [c for c in columns if c != 'time']:
+            dtype = np.dtype(info['columns'][column])
+            if n == 0:
+                arrays[column] = np.empty(0, dtype=dtype)
+            else:
+                arrays[column] = np.memmap(self._column_file(line, column), dtype=dtype, mode='r', shape=(n,))
+        return Survey.from_columns(arrays, line)
+
+    def load(self, lines=None, columns=None):
+        """
+        Opens a campaign holding some or all of the lines of the store, the files of the other lines are not read
+
+        Parameters
+        -----------
+        lines : list
+            names of the lines (default: all)
+        columns : list
+            names of the columns to open in addition to time (default: all)
+
+        Returns
+        -------
+        campaign : Campaign
+        """
+
+        if lines is None:
+            lines = self.lines
+        return Campaign([self.survey(line, columns) for line in lines], name=self.manifest['name'])
@@ -1,9 +1,286 @@
-import matplotlib.pyplot as plt
 import numpy as np
-from shapely.geometry import Point, LineString, Polygon
-from shapely.affinity import translate, rotate, scale, skew, affine_transform
-from descartes import PolygonPatch
 
+# dtypes of the columns common to all surveys, readings are stored in additional columns (one per channel)
+SURVEY_COLUMNS = {'time': np.dtype('datetime64[ns]'), 'station': np.dtype(np.int32), 'x': np.dtype(np.float64),
+                  'y': np.dtype(np.float64), 'z': np.dtype(np.float32)}
+READING_DTYPE = np.dtype(np.float32)
 
 
+class Reading:
+    """
+    View on one reading of a survey, holding no data but a reference to the survey and the index of the reading
 
+    Attributes
+    -----------
+    survey : Survey
+    index : int
+    """
+
+    __slots__ = ('survey', 'index')
+
+    def __init__(self, survey, index):
+        self.survey = survey
+        self.index = index
+
+    def __getitem__(self, column):
+        return self.survey.columns[column][self.index]
+
+    @property
+    def time(self):
+        return self['time']
+
+    @property
+    def station(self):
+        return self['station']
+
+    @property
+    def x(self):
+        return self['x']
+
+    @property
+    def y(self):
+        return self['y']
+
+    @property
+    def z(self):
+        return self['z']
+
+    @property
+    def values(self):
+        """ readings of all the channels """
+        return {c: self[c] for c in self.survey.channels}
+
+    def __repr__(self):
+        return 'Reading(time=%s, station=%d, x=%r, y=%r, z=%r, %s)' % (
+            self.time, self.station, self.x, self.y, self.z,
+            ', '.join('%s=%r' % (c, v) for c, v in self.values.items()))
+
+
+class Survey:
+    """
+    Readings of a survey line stored as typed numpy columns sorted by time
+
+    Slicing a survey by index or by time window returns a survey whose columns are views on the columns of the
+    original one, without copying any data.
+
+    Attributes
+    -----------
+    name : str
+    columns : dict
+        numpy arrays of times, station numbers, coordinates, elevations and readings of each channel
+    channels : tuple
+        names of the reading columns
+    """
+
+    def __init__(self, time, x, y, z=None, station=None, readings=None, name=None):
+        """
+        Survey
+
+        Parameters
+        -----------
+        time : numpy.array
+            times of the readings (datetime64 or int64 nanoseconds since the epoch)
+        x : numpy.array
+            x coordinates of the readings
+        y : numpy.array
+            y coordinates of the readings
+        z : numpy.array
+            elevations of the readings (default: nan)
+        station : numpy.array
+            station numbers of the readings (default: -1)
+        readings : dict
+            readings of each channel, by channel name
+        name : str
+            name of the survey line
+        """
+
+        time = np.asarray(time)
+        n = len(time)
+        columns = {'time': time.astype(SURVEY_COLUMNS['time'], copy=False),
+                   'station': np.full(n, -1) if station is None else station,
+                   'x': x, 'y': y, 'z': np.full(n, np.nan) if z is None else z}
+        columns = {k: np.asarray(v, dtype=SURVEY_COLUMNS[k]) for k, v in columns.items()}
+        if readings is not None:
+            columns.update({k: np.asarray(v, dtype=READING_DTYPE) for k, v in readings.items()})
+        for k, v in columns.items():
+            if v.shape != (n,):
+                raise ValueError('Column %s has shape %s, expected (%d,).' % (k, v.shape, n))
+        t = columns['time'].view(np.int64)
+        if np.any(t[1:] < t[:-1]):
+            order = np.argsort(t, kind='stable')
+            columns = {k: v[order] for k, v in columns.items()}
+        self._set_columns(columns, name)
+
+    def _set_columns(self, columns, name):
+        self.name = name
+        self.columns = columns
+        self.channels = tuple(k for k in columns if k not in SURVEY_COLUMNS)
+
+    @classmethod
+    def from_columns(cls, columns, name=None):
+        """
+        Builds a survey from columns already typed and sorted by time, without copying them
+
+        Parameters
+        -----------
+        columns : dict
+            numpy arrays of the survey columns
+        name : str
+            name of the survey line
+
+        Returns
+        -------
+        survey : Survey
+        """
+
+        survey = cls.__new__(cls)
+        survey._set_columns(dict(columns), name)
+        return survey
+
+    def __len__(self):
+        return len(self.columns['time'])
+
+    def __getitem__(self, item):
+        if isinstance(item, str):
+            return self.columns[item]
+        if isinstance(item, slice):
+            return Survey.from_columns({k: v[item] for k, v in self.columns.items()}, self.name)
+        index = range(len(self))[item]
+        return Reading(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield Reading(self, i)
+
+    @property
+    def nbytes(self):
+        """ memory used by the columns """
+        return sum(v.nbytes for v in self.columns.values())
+
+    @property
+    def times(self):
+        """ times of the readings as int64 nanoseconds since the epoch (view) """
+        return self.columns['time'].view(np.int64)
+
+    @property
+    def xy(self):
+        """ array of shape (N, 2) of the coordinates of the readings """
+        return np.column_stack([self.columns['x'], self.columns['y']])
+
+    def window(self, t0=None, t1=None):
+        """
+        Selects the readings acquired in the time window [t0, t1)
+
+        Parameters
+        -----------
+        t0 : numpy.datetime64 or str
+            start of the window (default: no lower bound)
+        t1 : numpy.datetime64 or str
+            end of the window, excluded (default: no upper bound)
+
+        Returns
+        -------
+        survey : Survey
+            view on the readings of the window
+        """
+
+        t = self.columns['time']
+        start = 0 if t0 is None else np.searchsorted(t, np.datetime64(t0, 'ns'), side='left')
+        stop = len(t) if t1 is None else np.searchsorted(t, np.datetime64(t1, 'ns'), side='left')
+        return self[start:stop]
+
+    def __repr__(self):
+        return 'Survey(name=%r, readings=%d, channels=%s)' % (self.name, len(self), self.channels)
+
+
+class Campaign:
+    """
+    Surveys of a campaign by line name
+
+    Attributes
+    -----------
+    name : str
+    surveys : dict
+    """
+
+    def __init__(self, surveys=None, name=None):
+        """
+        Campaign
+
+        Parameters
+        -----------
+        surveys : list
+            surveys of the campaign, their names must be unique
+        name : str
+            name of the campaign
+        """
+
+        self.name = name
+        self.surveys = {}
+        for survey in surveys or []:
+            self.add(survey)
+
+    def add(self, survey):
+        """
+        Adds a survey to the campaign
+
+        Parameters
+        -----------
+        survey : Survey
+            survey whose name is not yet used in the campaign
+        """
+
+        if survey.name in self.surveys:
+            raise ValueError('Line %s is already in the campaign.' % survey.name)
+        self.surveys[survey.name] = survey
+
+    @property
+    def lines(self):
+        """ names of the survey lines """
+        return list(self.surveys)
+
+    def __getitem__(self, line):
+        return self.surveys[line]
+
+    def __iter__(self):
+        return iter(self.surveys.values())
+
+    def __len__(self):
+        return len(self.surveys)
+
+    @property
+    def n_readings(self):
+        """ total number of readings """
+        return sum(len(s) for s in self)
+
+    @property
+    def nbytes(self):
+        """ memory used by the columns of all the surveys """
+        return sum(s.nbytes for s in self)
+
+    def window(self, t0=None, t1=None):
+        """
+        Selects the readings of all the surveys acquired in the time window [t0, t1)
+
+        Parameters
+        -----------
+        t0 : numpy.datetime64 or str
+            start of the window (default: no lower bound)
+        t1 : numpy.datetime64 or str
+            end of the window, excluded (default: no upper bound)
+
+        Returns
+        -------
+        campaign : Campaign
+            views on the readings of the window of each survey (surveys without readings in the window are left out)
+        """
+
+        campaign = Campaign(name=self.name)
+        for survey in self:
+            selected = survey.window(t0, t1)
+            if len(selected):
+                campaign.add(selected)
+        return campaign
+
+    def __repr__(self):
+        return 'Campaign(name=%r, lines=%d, readings=%d)' % (self.name, len(self), self.n_readings)
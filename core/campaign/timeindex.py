@@ -0,0 +1,242 @@
+import numpy as np
+from utils.ordered import SortedArray
+from core.campaign.survey import Survey
+
+# columns of the right survey copied by asof_join by default (positions of the readings)
+ASOF_COLUMNS = ('x', 'y', 'z')
+
+
+def _as_ns(t):
+    """ converts times (datetime64, str or integers) to int64 nanoseconds since the epoch """
+    t = np.asarray(t)
+    if t.dtype.kind in 'iu':
+        return t.astype(np.int64)
+    return t.astype('datetime64[ns]').view(np.int64)
+
+
+def _as_ns_delta(dt):
+    """ converts a duration (timedelta64 or integer) to int64 nanoseconds """
+    dt = np.asarray(dt)
+    if dt.dtype.kind in 'iu':
+        return dt.astype(np.int64)
+    return dt.astype('timedelta64[ns]').view(np.int64)
+
+
+class TimeIndex:
+    """
+    Index of rows of a table (e.g. the readings of a survey) by time
+
+    The timestamps are kept as int64 nanoseconds in a SortedArray, along with the row of each timestamp, so that time
+    windows and as-of matches of many times at once are answered by binary searches, and that new rows are added
+    without rebuilding the index.
+
+    Attributes
+    -----------
+    keys : SortedArray
+        sorted timestamps
+    rows : numpy.array
+        rows of the indexed table, in the order of the timestamps
+    """
+
+    def __init__(self, times=None, rows=None, capacity=1024):
+        """
+        TimeIndex
+
+        Parameters
+        -----------
+        times : numpy.array
+            times of the rows (datetime64 or int64 nanoseconds since the epoch), in any order
+        rows : numpy.array
+            rows of the times (default: 0, 1, ...)
+        capacity : int
+            initial number of rows for which memory is allocated
+        """
+
+        self.keys = SortedArray(dtype=np.int64)
+        self._rows = np.empty(capacity, dtype=np.int64)
+        self._n = 0
+        if times is not None:
+            self.append(times, rows)
+
+    @classmethod
+    def from_survey(cls, survey):
+        """
+        Indexes the readings of a survey
+
+        Parameters
+        -----------
+        survey : Survey
+
+        Returns
+        -------
+        index : TimeIndex
+        """
+
+        return cls(survey.times)
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def rows(self):
+        """ rows of the indexed table, in the order of the timestamps (view) """
+        return self._rows[:self._n]
+
+    @property
+    def times(self):
+        """ sorted timestamps as int64 nanoseconds since the epoch """
+        return self.keys.values
+
+    def append(self, times, rows=None):
+        """
+        Adds rows to the index, rows newer than those already indexed are appended without touching the index
+
+        Parameters
+        -----------
+        times : numpy.array
+            times of the rows
+        rows : numpy.array
+            rows of the times (default: len(self), len(self) + 1, ...)
+        """
+
+        times = _as_ns(times).ravel()
+        n = len(self)
+        rows = np.arange(n, n + len(times)) if rows is None else np.asarray(rows, dtype=np.int64)
+        if len(rows) != len(times):
+            raise ValueError('%d rows given for %d times.' % (len(rows), len(times)))
+        if np.any(times[1:] < times[:-1]):
+            rows = rows[np.argsort(times, kind='stable')]
+        positions = self.keys.update(times)
+        if n + len(rows) > len(self._rows):
+            # amortised growth of the rows buffer
+            self._rows = np.hstack([self._rows, np.empty(max(n + len(rows), len(self._rows)), dtype=np.int64)])
+        if len(positions) == 0 or positions[0] == n:
+            self._rows[n:n + len(rows)] = rows
+        else:
+            mask = np.zeros(n + len(rows), dtype=bool)
+            mask[positions] = True
+            merged = self._rows[:n + len(rows)]
+            merged[~mask] = self._rows[:n].copy()
+            merged[mask] = rows
+        self._n = n + len(rows)
+
+    def bounds(self, t0=None, t1=None):
+        """
+        Positions in the index of the time windows [t0, t1)
+
+        Parameters
+        -----------
+        t0 : numpy.datetime64, str or numpy.array
+            starts of the windows (default: no lower bound)
+        t1 : numpy.datetime64, str or numpy.array
+            ends of the windows, excluded (default: no upper bound)
+
+        Returns
+        -------
+        start : int or numpy.array
+        stop : int or numpy.array
+        """
+
+        start = 0 if t0 is None else self.keys.searchsorted(_as_ns(t0), side='left')
+        stop = len(self) if t1 is None else self.keys.searchsorted(_as_ns(t1), side='left')
+        return start, stop
+
+    def window(self, t0=None, t1=None):
+        """
+        Rows whose times are in the time window [t0, t1)
+
+        Parameters
+        -----------
+        t0 : numpy.datetime64 or str
+            start of the window (default: no lower bound)
+        t1 : numpy.datetime64 or str
+            end of the window, excluded (default: no upper bound)
+
+        Returns
+        -------
+        rows : numpy.array
+            rows in the order of their times (view)
+        """
+
+        start, stop = self.bounds(t0, t1)
+        return self.rows[start:stop]
+
+    def asof(self, times, tolerance=None, direction='backward'):
+        """
+        Matches each time with the row of the last indexed time before it, the first after it or the nearest one
+
+        Parameters
+        -----------
+        times : numpy.array
+            times to match
+        tolerance : numpy.timedelta64 or int
+            maximum time difference of the matches, in nanoseconds if an integer (default: no limit)
+        direction : str
+            'backward' (indexed time <= time), 'forward' (indexed time >= time) or 'nearest'
+
+        Returns
+        -------
+        rows : numpy.array
+            matched rows, -1 if no indexed time matches
+        """
+
+        if direction not in ('backward', 'forward', 'nearest'):
+            raise ValueError('Invalid direction %r.' % direction)
+        times = _as_ns(times)
+        keys = self.times
+        n = len(keys)
+        if n == 0:
+            return np.full(times.shape, -1, dtype=np.int64)
+
+        before = self.keys.searchsorted(times, side='right') - 1
+        after = np.where((before >= 0) & (keys[np.maximum(before, 0)] == times), before, before + 1)
+        d_before = np.where(before >= 0, times - keys[np.maximum(before, 0)], np.iinfo(np.int64).max)
+        d_after = np.where(after < n, keys[np.minimum(after, n - 1)] - times, np.iinfo(np.int64).max)
+        if direction == 'backward':
+            match, d = before, d_before
+        elif direction == 'forward':
+            match, d = after, d_after
+        else:
+            closer = d_after < d_before
+            match, d = np.where(closer, after, before), np.where(closer, d_after, d_before)
+        valid = d < np.iinfo(np.int64).max
+        if tolerance is not None:
+            valid &= d <= _as_ns_delta(tolerance)
+        return np.where(valid, self.rows[np.clip(match, 0, n - 1)], -1)
+
+
+def asof_join(left, right, columns=ASOF_COLUMNS, tolerance=None, direction='nearest'):
+    """
+    Copies in the readings of a survey the values of the readings of another survey that are the closest in time, e.g.
+    the positions of a 10 Hz GPS log into the 1 Hz readings of an instrument
+
+    Parameters
+    -----------
+    left : Survey
+        survey whose readings are completed
+    right : Survey
+        survey whose readings are matched
+    columns : tuple
+        columns of right copied into left
+    tolerance : numpy.timedelta64 or int
+        maximum time difference of the matches, in nanoseconds if an integer (default: no limit)
+    direction : str
+        'backward', 'forward' or 'nearest' (see TimeIndex.asof)
+
+    Returns
+    -------
+    survey : Survey
+        survey with the columns of left, the copied columns keep the values of left for the readings without match
+    """
+
+    rows = TimeIndex.from_survey(right).asof(left.times, tolerance=tolerance, direction=direction)
+    matched = rows >= 0
+    joined = dict(left.columns)
+    for column in columns:
+        values = right.columns[column]
+        if column in joined:
+            joined[column] = joined[column].astype(values.dtype)
+        else:
+            joined[column] = np.full(len(left), np.nan if values.dtype.kind == 'f' else -1, dtype=values.dtype)
+        joined[column][matched] = values[rows[matched]]
+    return Survey.from_columns(joined, left.name)
@@ -0,0 +1,19 @@
+import os
+import subprocess
+import sys
+
+# maximum time in seconds to import the modules, overridden by the BOOTSOFF_IMPORT_BUDGET environment variable
+IMPORT_BUDGET = float(os.environ.get('BOOTSOFF_IMPORT_BUDGET', 0.5))
+HEAVY_MODULES = ('matplotlib', 'pyvista', 'folium', 'descartes', 'shapely')
+
+
+def import_in_subprocess(modules):
+    """ imports modules in a fresh interpreter, returns the import time and the heavy modules it loaded """
+    code = ('import sys, time\n'
+            't = time.perf_counter()\n'
+            'for m in %r: __import__(m)\n'
+            'print(time.perf_counter() - t)\n'
+            'print(",".join(m for m in %r if m in sys.modules))' % (modules, HEAVY_MODULES))
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.split('\n')
+    return float(out[0]), [m for m in out[1].split(',') if m]
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from core.campaign import survey as sv
+from core.campaign.store import CampaignStore
+from core.campaign.timeindex import TimeIndex, asof_join
+from import_helpers import IMPORT_BUDGET, import_in_subprocess
+
+
+def make_survey(name='L1', n=100, start='2017-03-26T06:00:00'):
+    time = np.datetime64(start, 'ns') + np.arange(n) * np.timedelta64(1, 's')
+    x = np.linspace(0., 99., n)
+    return sv.Survey(time, x, np.zeros(n), z=np.full(n, 200.), station=np.arange(n) // 4,
+                     readings={'rho': np.linspace(10., 20., n)}, name=name)
+
+
+class SurveyTestCase(unittest.TestCase):
+    def test_survey(self):
+        s = make_survey()
+        self.assertEqual(len(s), 100)
+        self.assertEqual(s.channels, ('rho',))
+        self.assertEqual(s['x'].dtype, np.float64)
+        self.assertEqual(s['rho'].dtype, np.float32)
+        self.assertEqual(s[5].station, 1)
+        self.assertAlmostEqual(s[-1].x, 99.)
+        w = s.window('2017-03-26T06:00:10', '2017-03-26T06:00:20')
+        self.assertEqual(len(w), 10)
+        self.assertTrue(np.shares_memory(w['rho'], s['rho']))
+        self.assertEqual(w[0].x, 10.)
+
+    def test_survey_sorting(self):
+        time = np.array([3, 1, 2]) * 10 ** 9
+        s = sv.Survey(time, [3., 1., 2.], [0., 0., 0.])
+        np.testing.assert_array_equal(s['x'], [1., 2., 3.])
+        self.assertRaises(ValueError, sv.Survey, time, [1., 2.], [0., 0., 0.])
+
+    def test_campaign(self):
+        c = sv.Campaign([make_survey('L1'), make_survey('L2', n=50, start='2017-03-26T06:01:00')])
+        self.assertEqual(c.lines, ['L1', 'L2'])
+        self.assertEqual(c.n_readings, 150)
+        w = c.window('2017-03-26T06:01:30', '2017-03-26T07:00:00')
+        self.assertEqual(w.lines, ['L1', 'L2'])
+        self.assertEqual(w.n_readings, 10 + 20)
+        self.assertRaises(ValueError, c.add, make_survey('L1'))
+
+
+class StoreTestCase(unittest.TestCase):
+    def test_store(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'campaign')
+            store = CampaignStore(path, name='test')
+            store.write(sv.Campaign([make_survey('L1'), make_survey('L2', n=20)]))
+            store.append(make_survey('L1', n=10, start='2017-03-27T06:00:00'))
+            self.assertRaises(ValueError, store.append, make_survey('L1', n=10))
+
+            store = CampaignStore(path)
+            self.assertEqual(store.lines, ['L1', 'L2'])
+            campaign = store.load(lines=['L1'], columns=['x'])
+            s = campaign['L1']
+            self.assertEqual(len(s), 110)
+            self.assertEqual(s.channels, ())
+            self.assertIsInstance(s['x'], np.memmap)
+            np.testing.assert_array_equal(s['x'][100:], make_survey(n=10)['x'])
+            w = s.window('2017-03-27')
+            self.assertEqual(len(w), 10)
+            self.assertEqual(store.survey('L2')[19]['rho'], make_survey(n=20)[19]['rho'])
+
+
+class TimeIndexTestCase(unittest.TestCase):
+    def test_time_index(self):
+        index = TimeIndex([30, 10, 20, 40], rows=[3, 1, 2, 4])
+        np.testing.assert_array_equal(index.times, [10, 20, 30, 40])
+        np.testing.assert_array_equal(index.window(15, 40), [2, 3])
+        start, stop = index.bounds([0, 20], [25, 100])
+        np.testing.assert_array_equal(start, [0, 1])
+        np.testing.assert_array_equal(stop, [2, 4])
+        index.append([50, 60])
+        index.append([25], rows=[7])
+        np.testing.assert_array_equal(index.rows, [1, 2, 7, 3, 4, 4, 5])
+        np.testing.assert_array_equal(index.asof([5, 20, 26, 100]), [-1, 2, 7, 5])
+        np.testing.assert_array_equal(index.asof([5, 20, 26, 100], direction='forward'), [1, 2, 3, -1])
+        np.testing.assert_array_equal(index.asof([5, 20, 29, 100], direction='nearest', tolerance=3), [-1, 2, 3, -1])
+
+    def test_time_index_appends(self):
+        index = TimeIndex(capacity=4)
+        for i in range(100):
+            index.append([10 * i])
+        np.testing.assert_array_equal(index.rows, np.arange(100))
+        index.append([5, 995], rows=[100, 101])
+        self.assertEqual(len(index), 102)
+        np.testing.assert_array_equal(index.window(0, 20), [0, 100, 1])
+        np.testing.assert_array_equal(index.asof([996]), [101])
+
+    def test_asof_join(self):
+        t0 = np.datetime64('2017-03-26T06:00:00', 'ns')
+        gps = sv.Survey(t0 + np.arange(1000) * np.timedelta64(100, 'ms'), np.arange(1000.), np.zeros(1000),
+                        z=np.full(1000, 200.))
+        readings = sv.Survey(t0 + np.arange(120) * np.timedelta64(1, 's') + np.timedelta64(30, 'ms'),
+                             np.full(120, np.nan), np.full(120, np.nan), readings={'rho': np.ones(120)}, name='L1')
+        joined = asof_join(readings, gps, tolerance=np.timedelta64(50, 'ms'))
+        self.assertEqual(joined.name, 'L1')
+        np.testing.assert_array_equal(joined['x'][:100], np.arange(0., 1000., 10.))
+        self.assertTrue(np.isnan(joined['x'][100:]).all())
+        self.assertTrue(np.isnan(readings['x']).all())
+        self.assertEqual(joined.channels, ('rho',))
+
+
+class ImportTestCase(unittest.TestCase):
+    def test_lazy_imports(self):
+        elapsed, loaded = import_in_subprocess(('core.campaign.survey', 'core.campaign.store',
+                                                'core.campaign.timeindex'))
+        self.assertEqual(loaded, [])
+        self.assertLess(elapsed, IMPORT_BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import numpy as np
+from utils import instrumentation
+from utils.topo import profile as pf
+from utils.topo import topo
+
+KNOWN_POINTS = [[0, 284], [58, 280], [152, 275], [217, 270], [228, 267], [305, 265], [340, 260], [374, 255]]
+
+
+class InstrumentationTestCase(unittest.TestCase):
+    def setUp(self):
+        pf._profile_curves.clear()
+
+    def test_disabled(self):
+        instrumentation.reset()
+        self.assertFalse(instrumentation.enabled)
+        topo.azimuth([0., 0.], [1., 1.])
+        self.assertEqual(instrumentation.stats(), {})
+
+    def test_instrumented(self):
+        with instrumentation.instrumented() as stats:
+            pf.cclength2xz(KNOWN_POINTS, np.linspace(0., 300., 31))
+            pf.cclength2xz(KNOWN_POINTS, [10.])
+            pf.cclength([1., 2., 3., 4.], 1.)
+        self.assertFalse(instrumentation.enabled)
+        stats = instrumentation.stats()
+        self.assertEqual(stats['utils.topo.profile.cclength2xz']['calls'], 2)
+        self.assertEqual(stats['utils.topo.profile.profile_curve']['counters'], {'cache_misses': 1, 'cache_hits': 1})
+        self.assertGreater(stats['utils.topo.profile.cclength_pieces']['counters']['gl_evaluations'], 0)
+        self.assertGreater(stats['utils.topo.profile._cclengths2abs']['counters']['newton_iterations'], 0)
+        self.assertGreater(stats['utils.topo.profile.cclength']['counters']['quad_evaluations'], 0)
+        self.assertGreaterEqual(stats['utils.topo.profile.cclength2xz']['time'],
+                                stats['utils.topo.profile.profile_curve']['time'])
+        self.assertEqual(json.loads(instrumentation.to_json()), stats)
+        with self.assertLogs('utils.instrumentation', level='INFO') as logs:
+            instrumentation.log_stats()
+        self.assertEqual(len(logs.records), len(stats))
+
+    def test_environment_variable(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'stats.json')
+            env = dict(os.environ, BOOTSOFF_INSTRUMENT='1', BOOTSOFF_INSTRUMENT_OUTPUT=output)
+            subprocess.run([sys.executable, '-c', 'from utils.topo import topo; topo.ddmm_to_dd(6030.)'], env=env,
+                           check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            with open(output, 'r') as f:
+                self.assertEqual(json.load(f)['utils.topo.topo.ddmm_to_dd']['calls'], 1)
+
+    def test_logging(self):
+        with self.assertLogs('utils.topo.profile', level='ERROR'):
+            self.assertEqual(pf.cclengths([[1., 0.], [2., 1.]]), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
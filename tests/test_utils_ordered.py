@@ -0,0 +1,61 @@
+import bisect
+import unittest
+import numpy as np
+from utils import ordered
+
+
+class OrderedTestCase(unittest.TestCase):
+    def test_check_order(self):
+        self.assertTrue(ordered.check_order([1., 2., 2., 5.]))
+        self.assertFalse(ordered.check_order(np.array([1., 3., 2.])))
+        self.assertTrue(ordered.check_order([]))
+
+    def test_insert_in_order(self):
+        actual = ordered.insert_in_order([3., 7., 11.5, 99.1], 11.9, True)
+        self.assertEqual(actual, [3., 7., 11.5, 11.9, 99.1])
+        self.assertIs(ordered.bin_search([3., 1.], 2., check=True), np.nan)
+
+    def test_sorted_array(self):
+        rng = np.random.default_rng(0)
+        a = ordered.SortedArray(dtype=np.int64, block_size=4)
+        expected = []
+        for x in rng.integers(0, 20, 500):
+            position = a.insert(x)
+            self.assertEqual(position, bisect.bisect_right(expected, x))
+            expected.insert(position, x)
+        np.testing.assert_array_equal(a.values, expected)
+        self.assertEqual(len(a), 500)
+        self.assertEqual(a[-1], expected[-1])
+        self.assertEqual(a[123], expected[123])
+        self.assertEqual(a.bisect_left(7), bisect.bisect_left(expected, 7))
+        self.assertEqual(a.bisect_right(7), bisect.bisect_right(expected, 7))
+        self.assertNotIn(25, a)
+        np.testing.assert_array_equal(a.searchsorted([-1, 7, 25], side='right'),
+                                      np.searchsorted(expected, [-1, 7, 25], side='right'))
+
+    def test_sorted_array_update(self):
+        a = ordered.SortedArray([5., 1., 3.], block_size=2)
+        positions = a.update([4., 0., 3., 9.])
+        np.testing.assert_array_equal(a.values, [0., 1., 3., 3., 4., 5., 9.])
+        np.testing.assert_array_equal(positions, [0, 3, 4, 6])
+        self.assertEqual(a.insert(2.), 2)
+        self.assertTrue(ordered.check_order(a))
+        self.assertEqual(ordered.bin_search(a, 3.), 3)
+        np.testing.assert_array_equal(ordered.insert_in_order(a, 6.).values, [0., 1., 2., 3., 3., 4., 5., 6., 9.])
+        np.testing.assert_array_equal(a.update([12., 10., 11.]), [9, 10, 11])
+        self.assertEqual(a.insert(9.5), 9)
+        np.testing.assert_array_equal(a.values, [0., 1., 2., 3., 3., 4., 5., 6., 9., 9.5, 10., 11., 12.])
+
+    def test_sorted_array_appends(self):
+        a = ordered.SortedArray(dtype=np.int64, block_size=4)
+        for i in range(100):
+            np.testing.assert_array_equal(a.update([2 * i, 2 * i + 1]), [2 * i, 2 * i + 1])
+        np.testing.assert_array_equal(a.values, np.arange(200))
+        self.assertEqual(len(a), 200)
+        self.assertLessEqual(len(a._blocks), 200 // 4)
+        self.assertEqual(a[137], 137)
+        self.assertEqual(a.insert(-1), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
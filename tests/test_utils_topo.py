@@ -1,8 +1,22 @@
+import json
+import os
+import tempfile
 import unittest
+from unittest import mock
+import folium
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
 import numpy as np
-from shapely.geometry import Point
+import pyvista as pv
+from shapely.geometry import LineString, Point, Polygon
 from utils.topo import profile as pf
 from utils.topo import topo
+from utils.topo import coordinates
+from utils.topo import spatial
+from utils.topo import geometry
+from utils import instrumentation
+from import_helpers import IMPORT_BUDGET, import_in_subprocess
 
 
 class TopoTestCase(unittest.TestCase):
@@ -12,6 +26,24 @@ class TopoTestCase(unittest.TestCase):
         expected = 60.5
         self.assertAlmostEqual(actual, expected, places=12)
 
+    def test_ddmm_to_dd_array(self):
+        actual = topo.ddmm_to_dd(np.array([6030., 511.1, 511.1]), hemisphere=['N', 'E', 'W'])
+        expected = [60.5, 5.185, -5.185]
+        np.testing.assert_allclose(actual, expected, rtol=1.e-12)
+        # the hemisphere gives the sign of signed angles
+        self.assertEqual(topo.ddmm_to_dd(-6030., 'S'), -60.5)
+        self.assertEqual(topo.ddmm_to_dd(-6030., 'N'), 60.5)
+
+    def test_dms_to_dd(self):
+        actual = topo.dms_to_dd(['50\u00b008\'29.04"N', '5 11 06 W', b'-5:11:06', 'S 0 30 0'])
+        expected = [50.1414, -5.185, -5.185, -0.5]
+        np.testing.assert_allclose(actual, expected, rtol=1.e-12)
+        np.testing.assert_allclose(topo.ddmmss_to_dd(['500829.04N', b'0051106W', 5030.]),
+                                   [50.1414, -5.185, 50/60. + 30/3600.])
+        self.assertRaises(ValueError, topo.dms_to_dd, ['50 08'])
+        self.assertRaises(ValueError, topo.dms_to_dd, ['50 08', '5 11 06 07'])
+        self.assertEqual(topo.dms_to_dd([]).shape, (0,))
+
     def test_azimuth(self):
         origin = Point(0, 0)
         target = Point(1/2, np.sqrt(3)/2)
@@ -19,9 +51,337 @@ class TopoTestCase(unittest.TestCase):
         expected = np.pi/6.
         self.assertAlmostEqual(actual, expected, places=12)
 
+    def test_azimuth_array(self):
+        xy = np.array([[0., 0.], [0., 1.], [1., 1.], [1., 0.], [0., 0.]])
+        expected = [0., np.pi / 2., np.pi, 3. * np.pi / 2.]
+        np.testing.assert_allclose(topo.azimuth(xy[:-1], xy[1:]), expected, atol=1.e-12)
+        np.testing.assert_allclose(topo.track_azimuths(xy), expected, atol=1.e-12)
+        actual = topo.azimuth(Point(0, 0), np.array([[0.5, np.sqrt(3) / 2], [0., -1.]]))
+        np.testing.assert_allclose(actual, [np.pi / 6., np.pi], atol=1.e-12)
+
     def test_cclength2xz(self):
         known_points = [[0, 284], [58, 280], [152, 275], [217, 270], [228, 267], [305, 265], [340, 260], [374, 255],
                         [397, 250], [417, 245], [459, 240], [484, 245], [539, 250], [687, 245]]
         actual = pf.cclength2xz(known_points, np.linspace(0, 800, 81))[65][0]
         expected = 645.9384090750688
         self.assertAlmostEqual(actual, expected, places=12)
+
+    def test_cclength_pieces(self):
+        coefs = np.array([[0.01, -0.2, 1.5, 3.], [-0.003, 0.05, -0.4, 1.], [0., 0., 0., 2.]])
+        x_ends = np.array([10., 25., 4.])
+        actual = pf.cclength_pieces(coefs, x_ends)
+        expected = [pf.cclength(c, x) for c, x in zip(coefs, x_ends)]
+        np.testing.assert_allclose(actual, expected, rtol=1.e-9)
+        self.assertAlmostEqual(actual[2], 4., places=12)
+
+    def test_cclength_pieces_not_converged(self):
+        expected = pf.cclength([1., 2., 3., 4.], 2.)
+        with mock.patch.object(pf, 'GL_MIN_RTOL', 0.), mock.patch.object(pf, 'GL_MAX_SPLITS', 5):
+            actual = pf.cclength_pieces([[1., 2., 3., 4.]], 2., epsabs=0., epsrel=0.)
+            self.assertAlmostEqual(actual[0], expected, places=9)
+        with mock.patch.object(pf, 'GL_MIN_RTOL', 0.), mock.patch.object(pf, 'GL_MAX_INTERVALS', 64):
+            actual = pf.cclength_pieces(np.tile([1., 2., 3., 4.], (10, 1)), 2., epsabs=0., epsrel=0.)
+            np.testing.assert_allclose(actual, expected, rtol=1.e-12)
+        self.assertAlmostEqual(pf.cclength_pieces([[1., 2., 3., 4.]], 2., epsabs=0., epsrel=0.)[0], expected, places=9)
+
+    def test_cclength2abs(self):
+        coefs = [0.01, -0.2, 1.5, 3.]
+        lengths = np.array([0., 1., 5., 11.5])
+        actual = pf.cclength2abs(coefs, lengths, x_end=10.)
+        self.assertEqual(actual.shape, lengths.shape)
+        np.testing.assert_allclose([pf.cclength(coefs, x) for x in actual], lengths, atol=1.e-8)
+        self.assertAlmostEqual(pf.cclength2abs(coefs, 5.), actual[2], places=9)
+
+    def test_profile_curve(self):
+        known_points = [[0, 284], [58, 280], [152, 275], [217, 270], [228, 267], [305, 265], [340, 260]]
+        curve = pf.profile_curve(known_points)
+        self.assertIs(curve, pf.profile_curve(np.array(known_points).T))
+        np.testing.assert_allclose(curve.lengths(), pf.cclengths(known_points))
+        np.testing.assert_allclose(curve.length_at(curve.x), curve.lengths(), atol=1.e-9)
+        xz = curve.xz_at(curve.lengths())
+        np.testing.assert_allclose(xz[:, 0], curve.x, atol=1.e-6)
+        self.assertTrue(np.isnan(curve.length_at(400.)))
+        self.assertRaises(ValueError, pf.ProfileCurve, [[1, 284], [58, 280]])
+
+    def test_cclength2xz_order(self):
+        known_points = [[0, 284], [58, 280], [152, 275], [217, 270], [228, 267], [305, 265], [340, 260]]
+        distances = np.array([300., -5., 12.5, 1000., 150., 0.])
+        actual = pf.cclength2xz(known_points, distances)
+        order = np.argsort(distances)
+        np.testing.assert_allclose(actual[order], pf.cclength2xz(known_points, distances[order]))
+        np.testing.assert_array_equal(np.isnan(actual[:, 0]), [False, True, False, True, False, False])
+        self.assertEqual(actual[5, 0], 0.)
+        # the last point of a straight profile is found though its computed length is slightly below the nominal one
+        np.testing.assert_allclose(pf.cclength2xz([[0, 0], [10, 0]], [0, 5, 10]), [[0, 0], [5, 0], [10, 0]])
+
+    def test_batch_cclength2xz(self):
+        known_points = [[0, 284], [58, 280], [152, 275], [217, 270], [228, 267], [305, 265], [340, 260]]
+        profiles = [known_points, known_points[:4], [[1, 284], [58, 280]]]
+        distances = [np.linspace(0, 300, 7), np.array([10., 400.]), np.array([5.])]
+        xz, offsets, errors = pf.batch_cclength2xz(profiles, distances, n_jobs=2, chunk_size=1)
+        np.testing.assert_array_equal(offsets, [0, 7, 9, 10])
+        np.testing.assert_allclose(xz[:7], pf.cclength2xz(known_points, distances[0]))
+        np.testing.assert_allclose(xz[7:9], pf.cclength2xz(known_points[:4], distances[1]))
+        self.assertEqual(list(errors), [2])
+        self.assertTrue(np.isnan(xz[9]).all())
+        packed = np.array(known_points + known_points[:4])
+        xz_packed, _, errors = pf.batch_cclength2xz(packed, distances[0], profile_offsets=[0, 7, 11])
+        np.testing.assert_allclose(xz_packed[:7], xz[:7])
+        self.assertEqual(errors, {})
+        xz_all, _, errors = pf.batch_cclength2xz([known_points, [[0, 284], [58]]], distances[0], n_jobs=0)
+        np.testing.assert_allclose(xz_all[:7], xz[:7])
+        self.assertEqual(list(errors), [1])
+        xz_none, offsets, errors = pf.batch_cclength2xz([], [])
+        self.assertEqual(xz_none.shape, (0, 2))
+        np.testing.assert_array_equal(offsets, [0])
+        self.assertEqual(errors, {})
+
+    def test_incremental_profile(self):
+        known_points = [[0, 284], [58, 280], [152, 275], [217, 270], [228, 267], [305, 265], [340, 260], [374, 255]]
+        profile = pf.IncrementalProfile(capacity=2)
+        for i, (x, z) in enumerate(known_points):
+            profile.append(x, z)
+            if i > 0:
+                np.testing.assert_allclose(profile.lengths(), pf.cclengths(known_points[:i + 1]), rtol=1.e-12)
+        self.assertEqual(len(profile), len(known_points))
+        self.assertRaises(ValueError, profile.append, 300, 250)
+
+
+class CoordinatesTestCase(unittest.TestCase):
+    def test_flip_geojson_coordinates(self):
+        geoms = [{'type': 'Point', 'coordinates': [5.18, 50.14]},
+                 {'type': 'LineString', 'coordinates': [[5.18, 50.14], [5.19, 50.15]]},
+                 {'type': 'MultiPolygon',
+                  'coordinates': [[[[0, 1], [2, 3], [4, 5], [0, 1]]], [[[6, 7], [8, 9], [6, 7]]]]},
+                 None]
+        gjsn = {'type': 'FeatureCollection', 'features': [{'type': 'Feature', 'geometry': g} for g in geoms]}
+        self.assertTrue(coordinates.flip_geojson_coordinates(gjsn))
+        self.assertEqual(geoms[0]['coordinates'], [50.14, 5.18])
+        self.assertEqual(geoms[1]['coordinates'], [[50.14, 5.18], [50.15, 5.19]])
+        self.assertEqual(geoms[2]['coordinates'], [[[[1, 0], [3, 2], [5, 4], [1, 0]]], [[[7, 6], [9, 8], [7, 6]]]])
+        geom = {'type': 'MultiPoint', 'coordinates': [[1., 2., 100.], [3., 4.]]}
+        self.assertEqual(coordinates.flip_coordinates(geom)['coordinates'], [[2., 1., 100.], [4., 3.]])
+
+    def test_stream_flip_geojson_coordinates(self):
+        features = [{'type': 'Feature', 'properties': {'ele': float(i), 'name': 'p"%d' % i},
+                     'geometry': {'type': 'Point', 'coordinates': [5.185 + i * 1.e-7, 50.141 - i * 1.e-7]}}
+                    for i in range(50)]
+        gjsn = {'type': 'FeatureCollection', 'crs': {'type': 'name', 'properties': {'name': 'CRS84'}},
+                'features': features, 'bbox': [5., 50., 6., 51.]}
+        with tempfile.TemporaryDirectory() as tmp:
+            infile = os.path.join(tmp, 'in.geojson')
+            outfile = os.path.join(tmp, 'out.geojson')
+            with open(infile, 'w') as f:
+                json.dump(gjsn, f, indent=1)
+            header = {}
+            self.assertEqual(list(coordinates.iter_geojson_features(infile, header=header, chunk_size=64)), features)
+            self.assertEqual(header, {'type': 'FeatureCollection', 'crs': gjsn['crs'], 'bbox': gjsn['bbox']})
+            count = coordinates.stream_flip_geojson_coordinates(infile, outfile, batch_size=7,
+                                                                predicate=lambda f: f['properties']['ele'] < 40.)
+            self.assertEqual(count, 40)
+            with open(outfile) as f:
+                actual = json.load(f)
+            self.assertRaises(ValueError, coordinates.stream_flip_geojson_coordinates, infile, infile)
+
+            def predicate(f):
+                if f['properties']['ele'] == 25.:
+                    raise RuntimeError('predicate failed')
+                return True
+            self.assertRaises(RuntimeError, coordinates.stream_flip_geojson_coordinates, infile, outfile, predicate,
+                              batch_size=7)
+            # the previous output is left untouched and no temporary file remains
+            with open(outfile) as f:
+                self.assertEqual(json.load(f), actual)
+            self.assertEqual(sorted(os.listdir(tmp)), ['in.geojson', 'out.geojson'])
+        coordinates.flip_geojson_coordinates(gjsn)
+        gjsn['features'] = gjsn['features'][:40]
+        self.assertEqual(actual, gjsn)
+
+    def test_iter_geojson_large_features(self):
+        track = {'type': 'Feature', 'properties': {},
+                 'geometry': {'type': 'LineString', 'coordinates': [[5. + i * 1.e-6, 50.] for i in range(20000)]}}
+        with tempfile.TemporaryDirectory() as tmp:
+            infile = os.path.join(tmp, 'track.geojson')
+            with open(infile, 'w') as f:
+                json.dump({'type': 'FeatureCollection', 'features': [track, track]}, f)
+            self.assertEqual(list(coordinates.iter_geojson_features(infile, chunk_size=64)), [track, track])
+            with open(infile, 'w') as f:
+                f.write('{"type": "FeatureCollection", "features": [{"type": "Feature", "geometry": [[1, 2]'
+                        + ' ' * 5000)
+            with mock.patch.object(coordinates, 'GEOJSON_MAX_VALUE_SIZE', 1000):
+                self.assertRaisesRegex(ValueError, 'larger than 1000', list,
+                                       coordinates.iter_geojson_features(infile, chunk_size=64))
+
+    def test_geojson_points_to_layer(self):
+        features = [{'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [5. + i * 1.e-6, 50. + i * 1.e-6]}}
+                    for i in range(1000)]
+        gjsn = {'type': 'FeatureCollection', 'features': features}
+        fg = coordinates.geojson_points_to_layer(gjsn, color='red')
+        self.assertEqual(len(fg._children), 1)
+        np.testing.assert_allclose(fg.get_bounds(), [[50., 5.], [50.000999, 5.000999]])
+        html = folium.Map().add_child(fg).get_root().render()
+        self.assertIn('L.circleMarker', html)
+        self.assertLess(len(html), 100 * len(features))
+        decimated = coordinates.geojson_points_to_layer(gjsn, zoom=10, cluster=True)
+        self.assertLess(len(list(decimated._children.values())[0].data), 10)
+
+    def test_bounded_feature_group(self):
+        fg = coordinates.BoundedFeatureGroup('test')
+        self.assertEqual(fg.get_bounds(), [[None, None], [None, None]])
+        for location in ([50.1, 5.2], [50.3, 5.1], [50.2, 5.4]):
+            fg.add_child(folium.Marker(location=location))
+        self.assertEqual(fg.get_bounds(), folium.FeatureGroup().add_child(fg).get_bounds())
+        np.testing.assert_allclose(coordinates.get_center(fg), (50.2, 5.25))
+        lonlat = np.array([[5.2, 50.1], [5.1, 50.3], [5.4, 50.2]])
+        self.assertEqual(coordinates.bounds_from_coordinates(lonlat, lonlat=True), fg.get_bounds())
+        np.testing.assert_allclose(coordinates.get_center(lonlat[:, ::-1]), (50.2, 5.25))
+
+
+class SpatialTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.xy = rng.uniform(0., 100., (2000, 2))
+        self.index = spatial.SpatialIndex(self.xy)
+
+    def test_nearest(self):
+        points = np.array([[10., 10.], [50., 75.]])
+        distances, indices = self.index.nearest(points)
+        brute = np.hypot(*(self.xy[None, :, :] - points[:, None, :]).transpose(2, 0, 1))
+        np.testing.assert_array_equal(indices, brute.argmin(axis=1))
+        np.testing.assert_allclose(distances, brute.min(axis=1))
+        i, j, d = self.index.within_radius(points, 5.)
+        expected = np.nonzero(brute <= 5.)
+        np.testing.assert_array_equal(i, expected[0])
+        np.testing.assert_array_equal(j, expected[1])
+
+    def test_within_bbox(self):
+        actual = self.index.within_bbox((10., 20., 30., 25.))
+        x, y = self.xy.T
+        np.testing.assert_array_equal(actual, np.nonzero((x >= 10.) & (x <= 30.) & (y >= 20.) & (y <= 25.))[0])
+
+    def test_corridor(self):
+        line = LineString([(0., 0.), (50., 50.), (100., 50.)])
+        indices, chainages, offsets = self.index.corridor(line, 2.)
+        expected = [i for i, p in enumerate(self.xy) if line.distance(Point(p)) <= 2.]
+        np.testing.assert_array_equal(np.sort(indices), expected)
+        np.testing.assert_allclose(chainages, [line.project(Point(self.xy[i])) for i in indices], atol=1.e-9)
+        np.testing.assert_allclose(np.abs(offsets), [line.distance(Point(self.xy[i])) for i in indices], atol=1.e-9)
+        self.assertTrue(np.all(np.diff(chainages) >= 0.))
+
+
+class GeometryTestCase(unittest.TestCase):
+    def test_transform_matrix_2d(self):
+        actual = geometry.transform_matrix_2d(LineString([(0., 0.), (10., 0.)]), (100., 200., 100., 220.))
+        expected = np.array([[0., -2., 0., 100.], [2., 0., 0., 200.], [0., 0., 1., 0.], [0., 0., 0., 1.]])
+        np.testing.assert_allclose(actual, expected, atol=1.e-12)
+        shapely_format = geometry.transform_matrix_2d((0., 0., 10., 0.), (100., 200., 100., 220.), shapely_format=True)
+        np.testing.assert_allclose(shapely_format, [*expected[:3, :3].ravel(), *expected[:3, 3]], atol=1.e-12)
+        batch = geometry.transform_matrices_2d([[0., 0., 10., 0.], [5., 5., 6., 6.]],
+                                               [[100., 200., 100., 220.], [0., 0., -1., -1.]])
+        self.assertEqual(batch.shape, (2, 4, 4))
+        np.testing.assert_allclose(batch[0], expected, atol=1.e-12)
+        np.testing.assert_allclose(batch[1] @ [5., 5., 3., 1.], [0., 0., 3., 1.], atol=1.e-12)
+
+    def test_fit_transform_2d(self):
+        expected = geometry.transform_matrix_2d((0., 0., 10., 0.), (100., 200., 120., 230.))
+        rng = np.random.default_rng(0)
+        points = rng.uniform(0., 10., (3, 8, 2))
+        homogeneous = np.concatenate([points, np.zeros((3, 8, 1)), np.ones((3, 8, 1))], axis=2)
+        targets = (homogeneous @ expected.T)[..., :2]
+        for affine in (False, True):
+            m, residuals = geometry.fit_transform_2d(points, targets, affine=affine)
+            self.assertEqual(residuals.shape, (3, 8))
+            np.testing.assert_allclose(m, np.broadcast_to(expected, (3, 4, 4)), atol=1.e-9)
+            np.testing.assert_allclose(residuals, 0., atol=1.e-9)
+        m, residuals = geometry.fit_transform_2d(points[0], targets[0] + rng.normal(0., 0.1, (8, 2)))
+        self.assertGreater(residuals.max(), 0.)
+
+    def test_transform_vtk_batch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = []
+            for i in range(3):
+                infile = os.path.join(tmp, 'section_%d.vtk' % i)
+                pv.Plane(i_resolution=4, j_resolution=4).save(infile)
+                jobs.append((geometry.transform_matrix_2d((0., 0., 1., 0.), (10. * i, 0., 10. * i, 2.)), infile, None))
+            jobs.append((np.eye(3), jobs[0][1], os.path.join(tmp, 'invalid.vtk')))
+            reports = geometry.transform_vtk_batch(jobs, n_jobs=2)
+            self.assertEqual([r['status'] for r in reports], ['transformed'] * 3 + ['error'])
+            transformed = pv.read(os.path.join(tmp, 'section_2_3D.vtk'))
+            np.testing.assert_allclose(transformed.points[:, :2],
+                                       pv.Plane(i_resolution=4, j_resolution=4).points[:, :2] @ [[0., 2.], [-2., 0.]]
+                                       + [20., 0.], atol=1.e-6)
+            jobs[1] = (np.eye(4), jobs[1][1], None)
+            reports = geometry.transform_vtk_batch(jobs[:3], n_jobs=0)
+            self.assertEqual([r['status'] for r in reports], ['skipped', 'transformed', 'skipped'])
+            # another input file of the same size and modification time written to the same output file
+            other = os.path.join(tmp, 'other.vtk')
+            pv.Plane(center=(5., 0., 0.), i_resolution=4, j_resolution=4).save(other)
+            stat = os.stat(jobs[0][1])
+            self.assertEqual(os.path.getsize(other), stat.st_size)
+            os.utime(other, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            reports = geometry.transform_vtk_batch([(jobs[0][0], other, os.path.join(tmp, 'section_0_3D.vtk'))])
+            self.assertEqual(reports[0]['status'], 'transformed')
+
+    def test_transform_legacy_vtk(self):
+        m = geometry.transform_matrix_2d((0., 0., 1., 0.), (100., 200., 100., 202.))
+        mesh = pv.Plane(i_resolution=10, j_resolution=7).cast_to_unstructured_grid()
+        mesh['rho'] = np.arange(mesh.n_cells, dtype=float)
+        mesh.field_data['info'] = [1, 2, 3]
+        expected = mesh.points @ m[:3, :3].T + m[:3, 3]
+        with tempfile.TemporaryDirectory() as tmp:
+            for binary in (True, False):
+                infile = os.path.join(tmp, 'section.vtk')
+                mesh.save(infile, binary=binary)
+                geometry.transform_vtk(m, infile, chunk_size=13)
+                transformed = pv.read(os.path.join(tmp, 'section_3D.vtk'))
+                np.testing.assert_allclose(transformed.points, expected, rtol=1.e-6)
+                np.testing.assert_array_equal(transformed['rho'], mesh['rho'])
+                np.testing.assert_array_equal(transformed.cells, mesh.cells)
+
+    def test_drape_points(self):
+        line = LineString([(100., 200.), (130., 240.), (130., 240.), (180., 240.)])
+        x = np.linspace(-10., 120., 27)
+        points = np.column_stack([x, np.zeros_like(x), np.linspace(250., 230., 27)])
+        actual = geometry.drape_points(points, line)
+        inside = (x >= 0.) & (x <= line.length)
+        expected = [line.interpolate(d).coords[0] for d in x[inside]]
+        np.testing.assert_allclose(actual[inside, :2], expected, atol=1.e-9)
+        np.testing.assert_allclose(actual[:, 2], points[:, 2])
+        np.testing.assert_allclose(actual[0, :2], [94., 192.], atol=1.e-9)
+        np.testing.assert_allclose(geometry.drape_points([[10., 2., 0.]], line, start=50.)[0], [140., 242., 0.])
+        np.testing.assert_allclose(geometry.drape_points(points[:, [0, 2]], line), actual)
+        self.assertRaises(ValueError, geometry.drape_points, points, [[100., 200.], [100., 200.]])
+
+    def test_plot_shapely_objs(self):
+        lines = [LineString([(i, 0.), (i + 1., 1.), (i + 2., 0.)]) for i in range(100)]
+        polygon = Polygon([(0., 0.), (10., 0.), (10., 10.), (0., 10.)], [[(2., 2.), (4., 2.), (4., 4.)]])
+        objs = lines + [Point(i, -1.) for i in range(50)] + [polygon]
+        ax = geometry.plot_shapely_objs(objs=objs, color='b')
+        self.assertEqual(len(ax.collections), 2)
+        self.assertEqual(len(ax.lines), 1)
+        self.assertEqual(len(ax.collections[0].get_segments()), 100)
+        self.assertEqual(len(ax.collections[1].get_paths()[0].vertices), 9)
+        np.testing.assert_allclose(ax.dataLim.bounds, [0., -1., 101., 11.])
+        with instrumentation.instrumented():
+            ax = geometry.plot_shapely_objs(objs=objs, marker='x', facecolor='r', linestyle='--', alpha=0.5,
+                                            line_kwargs={'linewidth': 2.}, point_kwargs={'markersize': 3.})
+        self.assertEqual(list(instrumentation.stats()), ['utils.topo.geometry.plot_shapely_objs'])
+        self.assertEqual(ax.lines[0].get_marker(), 'x')
+        self.assertEqual(ax.lines[0].get_linestyle(), 'None')
+        self.assertEqual(ax.lines[0].get_markersize(), 3.)
+        self.assertEqual(ax.collections[0].get_linewidth()[0], 2.)
+        self.assertEqual(ax.collections[0].get_alpha(), 0.5)
+        np.testing.assert_allclose(ax.collections[1].get_facecolor()[0], [1., 0., 0., 0.5])
+        ax = geometry.plot_profiles(objs=lines[:10], names=['P%d' % i for i in range(10)])
+        self.assertEqual(len(ax.collections), 1)
+        self.assertEqual(len(ax.lines), 3)
+        self.assertEqual(len(ax.lines[0].get_xdata()), 20)
+        self.assertEqual(len(ax.texts), 10)
+        plt.close('all')
+
+
+class ImportTestCase(unittest.TestCase):
+    def test_lazy_imports(self):
+        elapsed, loaded = import_in_subprocess(('utils.topo.geometry', 'utils.topo.coordinates', 'utils.topo.topo'))
+        self.assertEqual(loaded, [])
+        self.assertLess(elapsed, IMPORT_BUDGET)
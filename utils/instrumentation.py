@@ -0,0 +1,169 @@
+""" Opt-in instrumentation of the functions of the project
+
+Instrumented functions record their number of calls and their wall time, and the inner solvers they run record counters
+(e.g. the number of integrand evaluations of the arc length integrals) on the innermost instrumented function being
+executed. Instrumentation is disabled by default, in which case an instrumented function only checks a flag before
+calling the original function. It is enabled by setting the BOOTSOFF_INSTRUMENT environment variable (e.g. to 1), in
+which case the statistics are written at exit to the json file named by BOOTSOFF_INSTRUMENT_OUTPUT if it is set, or
+for a block of code with the instrumented context manager:
+
+    with instrumentation.instrumented() as stats:
+        cclength2xz(known_points, distances)
+    instrumentation.log_stats()
+"""
+
+import atexit
+from contextlib import contextmanager
+import functools
+import json
+import logging
+import os
+import time
+
+ENV_VARIABLE = 'BOOTSOFF_INSTRUMENT'
+OUTPUT_ENV_VARIABLE = 'BOOTSOFF_INSTRUMENT_OUTPUT'
+
+logger = logging.getLogger(__name__)
+
+# read by the instrumented functions and at the call sites of count, do not rebind it outside of this module
+enabled = os.environ.get(ENV_VARIABLE, '').lower() not in ('', '0', 'false', 'no')
+_stats = {}
+_active = []
+
+
+def _record(name):
+    record = _stats.get(name)
+    if record is None:
+        record = _stats[name] = {'calls': 0, 'time': 0., 'counters': {}}
+    return record
+
+
+def instrument(func=None, name=None):
+    """ decorator recording the number of calls and the wall time of a function when instrumentation is enabled
+
+    :param func: function to instrument
+    :type func: function
+    :param name: name of the function in the statistics (default: module.qualified_name)
+    :type name: str
+    :return: the instrumented function
+    :rtype: function
+    """
+
+    if func is None:
+        return functools.partial(instrument, name=name)
+    if name is None:
+        name = '%s.%s' % (func.__module__, func.__qualname__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return func(*args, **kwargs)
+        _active.append(name)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _active.pop()
+            record = _record(name)
+            record['calls'] += 1
+            record['time'] += elapsed
+    return wrapper
+
+
+def count(counter, n=1):
+    """ adds n to a counter of the innermost instrumented function being executed, call sites in hot loops should
+    check instrumentation.enabled first
+
+    :param counter: name of the counter
+    :type counter: str
+    :param n: increment
+    :type n: int
+    """
+
+    if not enabled:
+        return
+    counters = _record(_active[-1] if _active else '<module>')['counters']
+    counters[counter] = counters.get(counter, 0) + int(n)
+
+
+def enable():
+    """ enables instrumentation """
+    global enabled
+    enabled = True
+
+
+def disable():
+    """ disables instrumentation, the statistics are kept """
+    global enabled
+    enabled = False
+
+
+def reset():
+    """ clears the statistics """
+    _stats.clear()
+
+
+def stats():
+    """ gets a copy of the statistics
+
+    :return: number of calls, total wall time in seconds and counters of each instrumented function, by name
+    :rtype: dict
+    """
+
+    return {name: {'calls': r['calls'], 'time': r['time'], 'counters': dict(r['counters'])}
+            for name, r in _stats.items()}
+
+
+@contextmanager
+def instrumented(reset_stats=True):
+    """ context manager enabling instrumentation in a block of code, the previous state is restored at exit
+
+    :param reset_stats: if True the statistics are cleared first
+    :type reset_stats: bool
+    :return: the statistics, updated during the block (live view, use stats() for a copy)
+    :rtype: dict
+    """
+
+    global enabled
+    previous = enabled
+    if reset_stats:
+        reset()
+    enabled = True
+    try:
+        yield _stats
+    finally:
+        enabled = previous
+
+
+def to_json(filename=None):
+    """ exports the statistics as json
+
+    :param filename: name of the json file (default: the json is returned as a string)
+    :type filename: str
+    :return: json string if filename is None
+    :rtype: str
+    """
+
+    if filename is None:
+        return json.dumps(stats(), indent=1)
+    with open(filename, 'w') as f:
+        json.dump(stats(), f, indent=1)
+
+
+def log_stats(level=logging.INFO, log=logger):
+    """ writes one log record per instrumented function, slowest first
+
+    :param level: logging level
+    :type level: int
+    :param log: logger
+    :type log: logging.Logger
+    """
+
+    for name, r in sorted(_stats.items(), key=lambda item: -item[1]['time']):
+        log.log(level, '%s: %d calls, %.6f s%s', name, r['calls'], r['time'],
+                ''.join(', %s=%d' % c for c in sorted(r['counters'].items())))
+
+
+if enabled and os.environ.get(OUTPUT_ENV_VARIABLE):
+    atexit.register(to_json, os.environ[OUTPUT_ENV_VARIABLE])
@@ -1,16 +1,25 @@
-from bisect import bisect_left
+from bisect import bisect_left, bisect_right
+import logging
 import numpy as np
 
+# number of values per block of a SortedArray, blocks are split when they grow beyond twice this size
+BLOCK_SIZE = 1024
+
+logger = logging.getLogger(__name__)
+
 
 def check_order(a):
     """ Check if a list is ordered
-    :param a: ordered list
-    :type a: list
+    :param a: ordered list (a SortedArray is ordered by construction and is not checked)
+    :type a: list, numpy.array or SortedArray
     :return: True if a is ordered, False otherwise
     :rtype: bool
     """
 
-    return all(a[i] <= a[i + 1] for i in range(len(a) - 1))
+    if isinstance(a, SortedArray):
+        return True
+    a = np.asarray(a)
+    return bool(np.all(a[1:] >= a[:-1]))
 
 
 def bin_search(a, x, check=False):
@@ -26,12 +35,12 @@ def bin_search(a, x, check=False):
     """
     if check:
         if not check_order(a):
-            print('Warning: input list is not ordered, use a=sorted(a) before calling bin_search')
+            logger.warning('input list is not ordered, use a=sorted(a) before calling bin_search')
             return np.nan
 
-    print('len(a)-1:' , len(a)-1)
-    print('max(0, bisect_left(a, x))', max(0, bisect_left(a, x)))
-    return min(len(a),max(0, bisect_left(a, x)))
+    if isinstance(a, SortedArray):
+        return a.bisect_left(x)
+    return bisect_left(a, x)
 
 
 def insert_in_order(a, x, check=False):
@@ -46,6 +55,10 @@ def insert_in_order(a, x, check=False):
     :rtype: list
     """
 
+    if isinstance(a, SortedArray):
+        a.insert(x)
+        return a
+
     pos = bin_search(a, x, check)
 
     if pos is not np.nan:
@@ -54,6 +67,188 @@ def insert_in_order(a, x, check=False):
     return a
 
 
+class SortedArray:
+    """ sorted container of numbers stored as a list of blocks of sorted numpy arrays, along with the maximum of each
+    block, so that finding the position of a value takes O(log n) and inserting it only shifts the values of one block
+
+    :param values: initial values, in any order
+    :type values: list or numpy.array
+    :param dtype: dtype of the values
+    :type dtype: numpy.dtype
+    :param block_size: number of values per block
+    :type block_size: int
+    """
+
+    def __init__(self, values=None, dtype=float, block_size=BLOCK_SIZE):
+        self.dtype = np.dtype(dtype)
+        self.block_size = block_size
+        self._set_values(np.sort(np.asarray([] if values is None else values, dtype=self.dtype), kind='stable'))
+
+    def _set_values(self, values):
+        self._blocks = [values[i:i + self.block_size].copy() for i in range(0, len(values), self.block_size)]
+        self._maxes = [b[-1] for b in self._blocks]
+        self._offsets = None
+        self._values = values
+
+    def _invalidate(self):
+        self._offsets = None
+        self._values = None
+
+    @property
+    def offsets(self):
+        """ positions of the first value of each block (cached until the next insertion) """
+        if self._offsets is None:
+            self._offsets = np.cumsum([0] + [len(b) for b in self._blocks])
+        return self._offsets
+
+    @property
+    def values(self):
+        """ all the values as a single sorted numpy array (cached until the next insertion, do not modify it) """
+        if self._values is None:
+            self._values = np.concatenate(self._blocks) if self._blocks else np.empty(0, dtype=self.dtype)
+        return self._values
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __iter__(self):
+        for b in self._blocks:
+            yield from b
+
+    def __array__(self, dtype=None, copy=None):
+        return self.values if dtype is None else self.values.astype(dtype)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            if item < 0:
+                item += len(self)
+            if not 0 <= item < len(self):
+                raise IndexError('SortedArray index out of range')
+            b = int(np.searchsorted(self.offsets, item, side='right')) - 1
+            return self._blocks[b][item - self.offsets[b]]
+        return self.values[item]
+
+    def __contains__(self, x):
+        i = self.bisect_left(x)
+        return i < len(self) and self[i] == x
+
+    def __repr__(self):
+        return 'SortedArray(%s)' % np.array2string(self.values, threshold=10)
+
+    def _bisect(self, x, side):
+        if not self._blocks:
+            return 0
+        b = (bisect_left if side == 'left' else bisect_right)(self._maxes, x)
+        if b == len(self._blocks):
+            return len(self)
+        return int(self.offsets[b] + np.searchsorted(self._blocks[b], x, side=side))
+
+    def bisect_left(self, x):
+        """ position where to insert x before the values equal to x
+        :param x: value
+        :type x: int or float
+        :return: position
+        :rtype: int
+        """
+
+        return self._bisect(x, 'left')
+
+    def bisect_right(self, x):
+        """ position where to insert x after the values equal to x
+        :param x: value
+        :type x: int or float
+        :return: position
+        :rtype: int
+        """
+
+        return self._bisect(x, 'right')
+
+    def searchsorted(self, x, side='left'):
+        """ positions where to insert many values, as numpy.searchsorted
+        :param x: values
+        :type x: numpy.array
+        :param side: 'left' or 'right'
+        :type side: str
+        :return: positions
+        :rtype: numpy.array
+        """
+
+        return np.searchsorted(self.values, x, side=side)
+
+    def insert(self, x):
+        """ inserts a value after the values equal to it
+        :param x: value
+        :type x: int or float
+        :return: position of the inserted value
+        :rtype: int
+        """
+
+        x = self.dtype.type(x)
+        if not self._blocks:
+            self._blocks.append(np.array([x], dtype=self.dtype))
+            self._maxes.append(x)
+            self._invalidate()
+            return 0
+        b = min(bisect_right(self._maxes, x), len(self._blocks) - 1)
+        block = self._blocks[b]
+        i = int(np.searchsorted(block, x, side='right'))
+        offsets = self.offsets
+        pos = int(offsets[b]) + i
+        new_block = np.empty(len(block) + 1, dtype=self.dtype)
+        new_block[:i] = block[:i]
+        new_block[i] = x
+        new_block[i + 1:] = block[i:]
+        if len(new_block) > 2 * self.block_size:
+            self._blocks[b:b + 1] = [new_block[:self.block_size], new_block[self.block_size:]]
+            self._maxes[b:b + 1] = [new_block[self.block_size - 1], new_block[-1]]
+            self._offsets = None
+        else:
+            self._blocks[b] = new_block
+            self._maxes[b] = new_block[-1]
+            offsets[b + 1:] += 1
+        self._values = None
+        return pos
+
+    def update(self, x):
+        """ inserts many values at once, merging them with the current values in O(n + k log k), or in O(k log k)
+        if they are not smaller than the current values
+        :param x: values, in any order
+        :type x: list or numpy.array
+        :return: positions of the inserted values (in sorted order) in the container
+        :rtype: numpy.array
+        """
+
+        x = np.sort(np.asarray(x, dtype=self.dtype).ravel(), kind='stable')
+        n = len(self)
+        if len(x) and (n == 0 or x[0] >= self._maxes[-1]):
+            # values appended after the current ones fill the last block up to twice the block size, then new blocks
+            # are added, the other blocks are kept
+            offsets = self.offsets
+            k = 0
+            if n:
+                k = min(len(x), 2 * self.block_size - len(self._blocks[-1]))
+            if k > 0:
+                self._blocks[-1] = np.concatenate([self._blocks[-1], x[:k]])
+                self._maxes[-1] = x[k - 1]
+                offsets[-1] += k
+            blocks = [x[i:i + self.block_size] for i in range(k, len(x), self.block_size)]
+            if blocks:
+                self._blocks.extend(blocks)
+                self._maxes.extend(b[-1] for b in blocks)
+                self._offsets = np.concatenate([offsets, offsets[-1] + np.cumsum([len(b) for b in blocks])])
+            self._values = None
+            return np.arange(n, n + len(x))
+        values = self.values
+        positions = np.searchsorted(values, x, side='right') + np.arange(len(x))
+        merged = np.empty(len(values) + len(x), dtype=self.dtype)
+        mask = np.zeros(len(merged), dtype=bool)
+        mask[positions] = True
+        merged[mask] = x
+        merged[~mask] = values
+        self._set_values(merged)
+        return positions
+
+
 if __name__ == '__main__':
     a = [3., 7., 11.5, 99.1]
     x = 11.9
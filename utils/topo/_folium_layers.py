@@ -0,0 +1,83 @@
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+import numpy as np
+from utils.topo.coordinates import bounds_from_coordinates, _camelize
+
+
+class BoundedFeatureGroup(folium.FeatureGroup):
+    """ folium feature group keeping a running bounding box of its children, updated as they are added, so that
+    get_bounds and get_center do not walk through the children
+
+    Note: children modified after they are added are not taken into account.
+
+    :param name: feature group name
+    :type name: str
+    """
+
+    def __init__(self, name=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self._bounds = None
+
+    def add_child(self, child, name=None, index=None):
+        super().add_child(child, name=name, index=index)
+        if hasattr(child, 'get_bounds'):
+            self.extend_bounds(child.get_bounds())
+        return self
+
+    def extend_bounds(self, bounds):
+        """ extends the bounding box of the feature group to include bounds
+
+        :param bounds: bounds in the form [[lat_min, lon_min], [lat_max, lon_max]] (None for unknown values)
+        :type bounds: list
+        """
+
+        bounds = np.array(bounds, dtype=float)
+        if np.isnan(bounds).all():
+            return
+        if self._bounds is not None:
+            bounds = np.vstack([np.fmin(self._bounds[0], bounds[0]), np.fmax(self._bounds[1], bounds[1])])
+        self._bounds = bounds
+
+    def get_bounds(self):
+        if self._bounds is None:
+            return [[None, None], [None, None]]
+        return self._bounds.tolist()
+
+
+
+class PointLayer(MacroElement):
+    """ map layer drawing many points as circle markers on a canvas, from a single compact array of coordinates
+    instead of one folium element per point
+
+    :param locations: latitudes and longitudes of the points
+    :type locations: numpy.array
+    :param radius: radius of the circle markers in pixels
+    :type radius: float
+    :param options: other leaflet circle marker options (color, fill_opacity...)
+    :type options: dict
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            (function() {
+                var options = {{ this.options|tojson }};
+                options.renderer = L.canvas();
+                var data = {{ this.data|tojson }};
+                for (var i = 0; i < data.length; i++) {
+                    L.circleMarker(data[i], options).addTo({{ this._parent.get_name() }});
+                }
+            })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, locations, radius=3, **options):
+        super().__init__()
+        self._name = 'PointLayer'
+        self.locations = np.asarray(locations, dtype=float).reshape(-1, 2)
+        self.data = self.locations.tolist()
+        self.options = {'radius': radius, 'weight': 1, 'fillOpacity': 0.8}
+        self.options.update({_camelize(k): v for k, v in options.items()})
+
+    def _get_self_bounds(self):
+        return bounds_from_coordinates(self.locations)
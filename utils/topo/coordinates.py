@@ -1,6 +1,36 @@
+from itertools import chain, islice
+import json
+import logging
+import os
+import re
 import numpy as np
-import folium
+from utils import instrumentation
 
+# nesting depth of the positions in the coordinates of the geojson geometry types
+GEOMETRY_DEPTHS = {'Point': 0, 'MultiPoint': 1, 'LineString': 1, 'MultiLineString': 2, 'Polygon': 2,
+                   'MultiPolygon': 3}
+# number of characters read at once and number of features per batch when streaming geojson files
+GEOJSON_CHUNK_SIZE = 1 << 16
+GEOJSON_BATCH_SIZE = 10000
+# maximum number of characters of a json value (e.g. a feature) decoded by the streaming reader, so that malformed
+# files are not read to the end in memory
+GEOJSON_MAX_VALUE_SIZE = 1 << 28
+# size in pixels of a web map tile
+TILE_SIZE = 256
+# folium based classes, defined in a separate module so that folium is only imported when they are first used
+FOLIUM_CLASSES = ('BoundedFeatureGroup', 'PointLayer')
+
+logger = logging.getLogger(__name__)
+
+
+def __getattr__(name):
+    if name in FOLIUM_CLASSES:
+        from utils.topo import _folium_layers
+        return getattr(_folium_layers, name)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+@instrumentation.instrument
 def geojson_points_to_feature_group(gjsn, name='Unnamed feature group'):
     """ converts a geojson dictionary into a folium feature group
 
@@ -9,10 +39,13 @@ def geojson_points_to_feature_group(gjsn, name='Unnamed feature group'):
     :param name: feature group name
     :param name: str
     :return: a folium feature group
-    :rtype: folium.FeatureGroup
+    :rtype: BoundedFeatureGroup
     """
 
-    fg = folium.FeatureGroup(name)
+    import folium
+    from utils.topo._folium_layers import BoundedFeatureGroup
+
+    fg = BoundedFeatureGroup(name)
 
     for f in gjsn['features']:
         fg.add_child(folium.Marker(location=flip_coordinates(f['geometry'])['coordinates'],
@@ -21,6 +54,104 @@ def geojson_points_to_feature_group(gjsn, name='Unnamed feature group'):
     return fg
 
 
+def bounds_from_coordinates(coords, lonlat=False):
+    """ computes the bounding box of an array of coordinates in one vectorized pass
+
+    :param coords: latitudes and longitudes of the points (or longitudes and latitudes if lonlat is True)
+    :type coords: numpy.array
+    :param lonlat: True if the coordinates are given in the longitude, latitude order (e.g. geojson)
+    :type lonlat: bool
+    :return: bounds in the form [[lat_min, lon_min], [lat_max, lon_max]]
+    :rtype: list
+    """
+
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    if lonlat:
+        coords = coords[:, ::-1]
+    if len(coords) == 0:
+        return [[None, None], [None, None]]
+    return [np.nanmin(coords, axis=0).tolist(), np.nanmax(coords, axis=0).tolist()]
+
+
+def _camelize(key):
+    """ converts a python option name to a leaflet option name (e.g. fill_opacity to fillOpacity) """
+    head, *tail = key.split('_')
+    return head + ''.join(t.capitalize() for t in tail)
+
+
+@instrumentation.instrument
+def decimate_points(lonlat, zoom, pixels=1.):
+    """ selects the points to display on a web map at a given zoom level, keeping the first point in each cell of a
+    grid of pixels x pixels screen pixels of the web mercator projection
+
+    :param lonlat: longitudes and latitudes of the points
+    :type lonlat: numpy.array
+    :param zoom: web map zoom level
+    :type zoom: int
+    :param pixels: size of the grid cells in screen pixels
+    :type pixels: float
+    :return: indices of the selected points, in increasing order
+    :rtype: numpy.array
+    """
+
+    lonlat = np.asarray(lonlat, dtype=float).reshape(-1, 2)
+    scale = TILE_SIZE * 2. ** zoom / pixels
+    lat = np.radians(np.clip(lonlat[:, 1], -85.05112878, 85.05112878))
+    px = np.floor((lonlat[:, 0] + 180.) / 360. * scale)
+    py = np.floor((1. - np.log(np.tan(lat) + 1. / np.cos(lat)) / np.pi) / 2. * scale)
+    _, first = np.unique(np.column_stack([px, py]), axis=0, return_index=True)
+    return np.sort(first)
+
+
+@instrumentation.instrument
+def geojson_points_to_layer(gjsn, name='Unnamed feature group', cluster=False, zoom=None, pixels=1., radius=3,
+                            precision=7, **options):
+    """ converts the points of a geojson dictionary into a folium feature group holding a single compact layer,
+    suited to large numbers of points (see geojson_points_to_feature_group for one marker per point)
+
+    :param gjsn: a geojson dictionary
+    :type gjsn: dict
+    :param name: feature group name
+    :type name: str
+    :param cluster: if True, the points are clustered on the client side (leaflet.markercluster), otherwise they are
+        drawn as circle markers on a canvas
+    :type cluster: bool
+    :param zoom: if not None, the points are decimated to keep about one point per grid cell at this zoom level
+    :type zoom: int
+    :param pixels: size of the grid cells in screen pixels used for the decimation
+    :type pixels: float
+    :param radius: radius of the circle markers in pixels
+    :type radius: float
+    :param precision: number of decimals of the coordinates written in the map
+    :type precision: int
+    :param options: other leaflet circle marker options (color, fill_opacity...)
+    :type options: dict
+    :return: a folium feature group
+    :rtype: BoundedFeatureGroup
+    """
+
+    from utils.topo._folium_layers import BoundedFeatureGroup, PointLayer
+
+    lonlat = np.array([f['geometry']['coordinates'][:2] for f in gjsn['features']
+                       if f['geometry'] is not None and f['geometry']['type'] == 'Point'], dtype=float).reshape(-1, 2)
+    if zoom is not None:
+        lonlat = lonlat[decimate_points(lonlat, zoom, pixels)]
+    locations = np.round(lonlat[:, ::-1], precision)
+
+    fg = BoundedFeatureGroup(name)
+    if cluster:
+        from folium.plugins import FastMarkerCluster
+        marker_options = {'radius': radius, 'weight': 1, 'fillOpacity': 0.8}
+        marker_options.update({_camelize(k): v for k, v in options.items()})
+        callback = ('(function () { var options = %s; options.renderer = L.canvas(); '
+                    'return function (row) { return L.circleMarker(new L.LatLng(row[0], row[1]), options); }; })()'
+                    % json.dumps(marker_options))
+        fg.add_child(FastMarkerCluster(locations.tolist(), callback=callback))
+    else:
+        fg.add_child(PointLayer(locations, radius=radius, **options))
+    return fg
+
+
 def flip_coordinates(geom):
     """ flips the coordinates of a geometry object
 
@@ -30,20 +161,108 @@ def flip_coordinates(geom):
     :rtype: dict
     """
 
-    if geom['type'] == 'Point':
-        z = np.array(geom['coordinates'])
-        zf = z.flatten()
-        geom['coordinates'] = np.dstack((zf[1::2], zf[::2])).reshape(z.shape).tolist()
-    else:
-        print('flipping coordinates for %s geometries is not implemented yet...' %geom['type'])
+    flip_geometries_coordinates([geom])
     return geom
 
 
+def _flatten_positions(coords, depth, positions, counts):
+    """ appends the positions of nested geojson coordinates to a flat list and the lengths of the nested lists to counts
+
+    :param coords: geojson coordinates
+    :type coords: list
+    :param depth: nesting depth of the positions in coords
+    :type depth: int
+    :param positions: flat list of positions
+    :type positions: list
+    :param counts: lengths of the nested lists, depth first
+    :type counts: list
+    """
+
+    if depth == 0:
+        positions.append(coords)
+    elif depth == 1:
+        counts.append(len(coords))
+        positions.extend(coords)
+    else:
+        counts.append(len(coords))
+        for c in coords:
+            _flatten_positions(c, depth - 1, positions, counts)
+
+
+def _unflatten_positions(depth, positions, counts):
+    """ rebuilds nested geojson coordinates from positions and lengths of nested lists flattened by _flatten_positions
+
+    :param depth: nesting depth of the positions in the coordinates
+    :type depth: int
+    :param positions: iterator over the flat positions
+    :type positions: iterator
+    :param counts: iterator over the lengths of the nested lists
+    :type counts: iterator
+    :return: geojson coordinates
+    :rtype: list
+    """
+
+    if depth == 0:
+        return next(positions)
+    n = next(counts)
+    if depth == 1:
+        return list(islice(positions, n))
+    return [_unflatten_positions(depth - 1, positions, counts) for _ in range(n)]
+
+
+@instrumentation.instrument
+def flip_geometries_coordinates(geoms):
+    """ flips the coordinates of many geometry objects at once
+
+    The positions of all the geometries are gathered in one flat array, their axes are swapped in a single
+    vectorized operation and the results are scattered back into the geometries, which are modified in place.
+    Point, MultiPoint, LineString, MultiLineString, Polygon and MultiPolygon geometries are supported.
+
+    :param geoms: geojson geometry objects (None for features without geometry)
+    :type geoms: iterable
+    :return: number of geometries flipped
+    :rtype: int
+    """
+
+    flipped = []
+    positions = []
+    counts = []
+    unsupported = set()
+    for geom in geoms:
+        if geom is None:
+            continue
+        depth = GEOMETRY_DEPTHS.get(geom['type'])
+        if depth is None:
+            unsupported.add(geom['type'])
+            continue
+        flipped.append((geom, depth))
+        if depth == 0:
+            positions.append(geom['coordinates'])
+        else:
+            _flatten_positions(geom['coordinates'], depth, positions, counts)
+    for geom_type in unsupported:
+        logger.warning('flipping coordinates for %s geometries is not implemented yet...', geom_type)
+
+    if positions:
+        try:
+            buffer = np.array(positions)
+            buffer[:, [0, 1]] = buffer[:, [1, 0]]
+            positions = buffer.tolist()
+        except (ValueError, IndexError):
+            # positions with and without elevation
+            positions = [[p[1], p[0], *p[2:]] for p in positions]
+    positions = iter(positions)
+    counts = iter(counts)
+    for geom, depth in flipped:
+        geom['coordinates'] = next(positions) if depth == 0 else _unflatten_positions(depth, positions, counts)
+    return len(flipped)
+
+
+@instrumentation.instrument
 def flip_geojson_coordinates(gjsn):
     """ flips geojson geographic coordinates because folium uses the Latitude, Longitude order
-    while geojson format is Longitude, Latitude
-
-    Note: checked on points only...
+    while geojson format is Longitude, Latitude. The coordinates of all the features are flipped at once
+    (see flip_geometries_coordinates).
 
     :param gjsn: a geojson dictionary
     :type gjsn: dict
@@ -59,30 +278,268 @@ def flip_geojson_coordinates(gjsn):
         # to use pyproj then to check if this is WGS84 or to transform it to WGS84 before flipping coordinates
         if 'type' in gjsn.keys():
             if gjsn['type'] == 'FeatureCollection':
-                for f in gjsn['features']:
-                    flip_coordinates(f['geometry'])
+                flip_geometries_coordinates(f['geometry'] for f in gjsn['features'])
 
             else:
-                print('type is %s' %gjsn['type'] )
+                logger.warning('type is %s', gjsn['type'])
                 status = False
         else:
-            print('type not in keys...')
+            logger.warning('type not in keys...')
             status = False
     else:
-        print('Warning!: unable to flip coordinates')
+        logger.warning('unable to flip coordinates')
         status = False
     return status
 
 
+class _JSONStream:
+    """ incremental reader of the json values of a text file, keeping only the unread part of a chunk in memory
+
+    :param f: text file
+    :type f: file object
+    :param chunk_size: number of characters read at once
+    :type chunk_size: int
+    """
+
+    _whitespace = re.compile(r'\s*')
+
+    def __init__(self, f, chunk_size=GEOJSON_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size=None):
+        chunk = self.f.read(self.chunk_size if size is None else size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """ skips white spaces and returns the next character ('' at the end of the file) """
+        while True:
+            self.pos = self._whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars):
+        """ consumes the next character, which must be one of chars, and returns it """
+        c = self.peek()
+        if c == '' or c not in chars:
+            raise ValueError('Invalid geojson: expected one of %s, got %r' % (chars, c))
+        self.pos += 1
+        return c
+
+    def value(self):
+        """ decodes the next json value """
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # the value is incomplete: the unread part of the buffer is doubled before decoding it again, so that
+                # large values are decoded a bounded number of times
+                pending = len(self.buffer) - self.pos
+                if pending >= GEOJSON_MAX_VALUE_SIZE:
+                    raise ValueError('Invalid geojson: json value larger than %d characters' % GEOJSON_MAX_VALUE_SIZE)
+                if not self._fill(min(max(self.chunk_size, pending), GEOJSON_MAX_VALUE_SIZE - pending)):
+                    raise
+                continue
+            # a number at the end of the buffer may be truncated
+            if end < len(self.buffer) or not self._fill():
+                self.pos = end
+                return obj
+
+
+def iter_geojson_features(filename, header=None, chunk_size=GEOJSON_CHUNK_SIZE):
+    """ reads the features of a geojson FeatureCollection file one at a time, without loading the whole file
+
+    :param filename: geojson file
+    :type filename: str
+    :param header: dictionary where the other members of the FeatureCollection (type, crs...) are stored as they
+        are read
+    :type header: dict
+    :param chunk_size: number of characters read at once
+    :type chunk_size: int
+    :return: features
+    :rtype: generator
+    """
+
+    if header is None:
+        header = {}
+    with open(filename, 'r', encoding='utf-8') as f:
+        stream = _JSONStream(f, chunk_size)
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            key = stream.value()
+            stream.expect(':')
+            if key == 'features':
+                stream.expect('[')
+                if stream.peek() == ']':
+                    stream.expect(']')
+                else:
+                    while True:
+                        yield stream.value()
+                        if stream.expect(',]') == ']':
+                            break
+            else:
+                header[key] = stream.value()
+            if stream.expect(',}') == '}':
+                break
+
+
+def iter_geojson_batches(filename, batch_size=GEOJSON_BATCH_SIZE, header=None, chunk_size=GEOJSON_CHUNK_SIZE):
+    """ reads the features of a geojson FeatureCollection file by batches, without loading the whole file
+
+    :param filename: geojson file
+    :type filename: str
+    :param batch_size: number of features per batch
+    :type batch_size: int
+    :param header: dictionary where the other members of the FeatureCollection (type, crs...) are stored as they
+        are read
+    :type header: dict
+    :param chunk_size: number of characters read at once
+    :type chunk_size: int
+    :return: lists of features
+    :rtype: generator
+    """
+
+    features = iter_geojson_features(filename, header=header, chunk_size=chunk_size)
+    while True:
+        batch = list(islice(features, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class GeoJSONWriter:
+    """ writes a geojson FeatureCollection file one feature at a time
+
+    The members of header are written before the features, those added to header while the features are written
+    (e.g. by iter_geojson_features) are written after them when the writer is closed. The features are written to a
+    temporary file that replaces the geojson file when the writer is closed, it is deleted if the writer is aborted
+    (e.g. when an exception is raised in the with block) so that an incomplete file is never left behind.
+
+    :param filename: geojson file
+    :type filename: str
+    :param header: other members of the FeatureCollection (crs...)
+    :type header: dict
+    """
+
+    def __init__(self, filename, header=None):
+        self.header = {} if header is None else header
+        self.count = 0
+        self._encode = json.JSONEncoder().encode
+        self.filename = filename
+        self._tmp = filename + '.tmp'
+        self._f = open(self._tmp, 'w', encoding='utf-8')
+        self._written = {'type', 'features'}
+        self._f.write('{"type": "FeatureCollection", ')
+        self._write_header()
+        self._f.write('"features": [')
+
+    def _write_header(self):
+        for key, value in list(self.header.items()):
+            if key not in self._written:
+                self._f.write('%s: %s, ' % (json.dumps(key), json.dumps(value)))
+                self._written.add(key)
+
+    def write(self, feature):
+        """ writes a feature
+
+        :param feature: geojson feature
+        :type feature: dict
+        """
+
+        self._f.write(('\n' if self.count == 0 else ',\n') + self._encode(feature))
+        self.count += 1
+
+    def write_features(self, features):
+        """ writes features
+
+        :param features: geojson features
+        :type features: iterable
+        """
+
+        for feature in features:
+            self.write(feature)
+
+    def close(self):
+        """ writes the end of the FeatureCollection and closes the file """
+        if not self._f.closed:
+            self._f.write('\n]')
+            for key, value in list(self.header.items()):
+                if key not in self._written:
+                    self._f.write(', %s: %s' % (json.dumps(key), json.dumps(value)))
+                    self._written.add(key)
+            self._f.write('}\n')
+            self._f.close()
+            os.replace(self._tmp, self.filename)
+
+    def abort(self):
+        """ closes and deletes the temporary file, the geojson file is left untouched """
+        if not self._f.closed:
+            self._f.close()
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+@instrumentation.instrument
+def stream_flip_geojson_coordinates(infile, outfile, predicate=None, batch_size=GEOJSON_BATCH_SIZE):
+    """ flips the coordinates of the features of a geojson FeatureCollection file and writes them to another file,
+    by batches of features so that memory use does not depend on the size of the files
+
+    :param infile: input geojson file
+    :type infile: str
+    :param outfile: output geojson file
+    :type outfile: str
+    :param predicate: function of a feature returning True if the feature should be kept (default: keep all)
+    :type predicate: function
+    :param batch_size: number of features per batch
+    :type batch_size: int
+    :return: number of features written
+    :rtype: int
+    """
+
+    if os.path.abspath(infile) == os.path.abspath(outfile):
+        raise ValueError('geojson files cannot be flipped in place')
+    header = {}
+    batches = iter_geojson_batches(infile, batch_size=batch_size, header=header)
+    # the members preceding the features are read with the first batch and written before the features
+    first = next(batches, [])
+    with GeoJSONWriter(outfile, header=header) as writer:
+        for features in chain([first], batches):
+            if predicate is not None:
+                features = [f for f in features if predicate(f)]
+            flip_geometries_coordinates(f['geometry'] for f in features)
+            writer.write_features(features)
+    return writer.count
+
+
 def get_center(obj):
     """ gets the coordinates of the center of the bounding box around a folium object that exposes a get_bounds method
+    (O(1) for a BoundedFeatureGroup) or around an array of coordinates
 
-    :param obj; a folium object with the get_bounds method
+    :param obj; a folium object with the get_bounds method or an array of latitudes and longitudes
     :type obj: object
     :return coordinates of the center of the bounding box
     :rtype tuple
     """
-    return tuple(np.mean(obj.get_bounds(), axis=0))
+    bounds = obj.get_bounds() if hasattr(obj, 'get_bounds') else bounds_from_coordinates(obj)
+    return tuple(np.mean(bounds, axis=0))
 
 
 if __name__ == '__main__':
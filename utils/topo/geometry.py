@@ -1,11 +1,22 @@
-import matplotlib.pyplot as plt
-import pyvista as pv
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+import json
+import logging
+import os
+import shutil
+import time
 import numpy as np
-from shapely.geometry import Point, LineString, Polygon
-from descartes import PolygonPatch
+from utils import instrumentation
+
+logger = logging.getLogger(__name__)
 
 
 def plot_shapely_obj(ax=None, obj=None, **kwargs):
+    # plotting backends are imported on first use, importing this module must stay cheap
+    import matplotlib.pyplot as plt
+    from shapely.geometry import Point, LineString, Polygon
+    from descartes import PolygonPatch
+
     if ax is None:
         fig, ax = plt.subplots()
     if type(obj) in (Point, LineString):
@@ -15,81 +26,510 @@ def plot_shapely_obj(ax=None, obj=None, **kwargs):
         patch = PolygonPatch(obj, **kwargs)
         ax.add_patch(patch)
     else:
-        print('Warning: Invalid object type')
+        logger.warning('Invalid object type')
+    return ax
+
+
+def _polygon_path(obj):
+    """ path of a polygon, holes included (one closed sub-path per ring) """
+    from matplotlib.path import Path
+
+    rings = [np.asarray(obj.exterior.coords)[:, :2]] + [np.asarray(r.coords)[:, :2] for r in obj.interiors]
+    codes = [np.full(len(r), Path.LINETO, dtype=Path.code_type) for r in rings]
+    for c in codes:
+        c[0] = Path.MOVETO
+        c[-1] = Path.CLOSEPOLY
+    return Path(np.concatenate(rings), np.concatenate(codes))
+
+
+def _artist_kwargs(artist_type, kwargs):
+    """ keeps the style keywords that an artist type accepts (e.g. marker for Line2D but not for LineCollection) """
+    return {k: v for k, v in kwargs.items() if hasattr(artist_type, 'set_' + k)}
+
+
+@instrumentation.instrument
+def plot_shapely_objs(ax=None, objs=None, point_kwargs=None, line_kwargs=None, polygon_kwargs=None, **kwargs):
+    """ plots many shapely objects at once, with a single artist per object type: the points are drawn by one call to
+    plot, the lines by a LineCollection and the polygons by a PathCollection
+    :param ax: matplotlib axes (a new figure is created if None)
+    :param objs: iterable of Point, LineString and Polygon objects
+    :param point_kwargs: style of the points (Line2D keywords, e.g. marker, markersize, color)
+    :param line_kwargs: style of the lines (LineCollection keywords, e.g. color, linestyle, linewidth)
+    :param polygon_kwargs: style of the polygons (PathCollection keywords, e.g. facecolor, edgecolor, alpha)
+    :param kwargs: style shared by all the object types, each keyword is only passed to the artists that accept it
+        (e.g. marker only to the points, facecolor only to the polygons), the per-type styles take precedence
+    :return: the axes"""
+
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection, PathCollection
+    from matplotlib.lines import Line2D
+    from shapely.geometry import Point, LineString, Polygon
+
+    if ax is None:
+        fig, ax = plt.subplots()
+    points, lines, polygons = [], [], []
+    invalid = False
+    for obj in objs:
+        if type(obj) is Point:
+            points.append(obj.coords[0][:2])
+        elif type(obj) is LineString:
+            lines.append(np.asarray(obj.coords)[:, :2])
+        elif type(obj) is Polygon:
+            polygons.append(_polygon_path(obj))
+        else:
+            invalid = True
+    if invalid:
+        logger.warning('Invalid object type')
+    if points:
+        x, y = np.asarray(points).T
+        # points are not joined, the shared line style is meant for the lines
+        shared = {k: v for k, v in _artist_kwargs(Line2D, kwargs).items() if k not in ('linestyle', 'ls')}
+        ax.plot(x, y, **{'linestyle': 'none', 'marker': 'o', **shared, **(point_kwargs or {})})
+    if lines:
+        ax.add_collection(LineCollection(lines, **{**_artist_kwargs(LineCollection, kwargs), **(line_kwargs or {})}))
+    if polygons:
+        ax.add_collection(PathCollection(polygons, **{**_artist_kwargs(PathCollection, kwargs),
+                                                      **(polygon_kwargs or {})}))
+    ax.autoscale_view()
     return ax
 
 
+@instrumentation.instrument
 def transform_matrix_2d(from_obj, to_obj, shapely_format=False):
-    # TODO: deal with more than two points in from_points and to_points using best fit ?
+    """ computes the matrix of the similarity transform in the horizontal plane mapping the ends of a line onto the ends
+    of another line
+
+    :param from_obj: line to transform, as a LineString or a tuple (x_start, y_start, x_end, y_end)
+    :param to_obj: line onto which from_obj is mapped, as a LineString or a tuple (x_start, y_start, x_end, y_end)
+    :param shapely_format: if True the transform is returned as a list of coefficients to use with
+        shapely.affinity.affine_transform
+    :return: a 4x4 affine transform matrix"""
+
     # TODO: introduce skew?
     if type(from_obj) is not tuple:
-        f = (*from_obj.coords[0], *from_obj.coords[-1])
+        f = (*from_obj.coords[0][:2], *from_obj.coords[-1][:2])
         f_length = from_obj.length
     else:
         f = from_obj
-        f_length = np.sqrt((f[2] - f[0]) ** 2 + (f[3] - f[1]) ** 2)
+        f_length = None
     if type(to_obj) is not tuple:
-        t = (*to_obj.coords[0], *to_obj.coords[-1])
+        t = (*to_obj.coords[0][:2], *to_obj.coords[-1][:2])
         t_length = to_obj.length
     else:
         t = to_obj
-        t_length = np.sqrt((t[2] - t[0]) ** 2 + (t[3] - t[1]) ** 2)
-    print(f, t)
-    theta = np.arctan2(t[3] - t[1], t[2] - t[0]) - np.arctan2(f[3] - f[1], f[2] - f[0])
-    ct = np.cos(theta)
-    st = np.sin(theta)
-    sf = (t_length / f_length)
-    t1x = -f[0]
-    t1y = -f[1]
-    t2x = t[0]
-    t2y = t[1]
-
-    a = sf * ct
-    b = -sf * st
-    c = 0.
-    xoff = t1x * sf * ct - t1y * sf * st + t2x
-    d = sf * st
-    e = sf * ct
-    f = 0.
-    yoff = t1x * sf * st + t1y * sf * ct + t2y
-    g = 0.
-    h = 0.
-    i = 1.
-    zoff = 0.
+        t_length = None
+    m = transform_matrices_2d(f, t, from_lengths=f_length, to_lengths=t_length)[0]
 
     if shapely_format:
-        return [a,b,c,d,e,f,g,h,i,xoff,yoff,zoff]
+        return [*m[:3, :3].ravel(), *m[:3, 3]]
+    else:
+        return m
+
+
+@instrumentation.instrument
+def transform_matrices_2d(from_endpoints, to_endpoints, from_lengths=None, to_lengths=None):
+    """ computes the matrices of the similarity transforms in the horizontal plane mapping the ends of lines onto the
+    ends of other lines, all at once
+
+    :param from_endpoints: array of shape (K, 4) of the ends (x_start, y_start, x_end, y_end) of the lines to transform
+    :param to_endpoints: array of shape (K, 4) of the ends of the lines onto which they are mapped
+    :param from_lengths: lengths of the lines to transform (default: distances between their ends)
+    :param to_lengths: lengths of the lines onto which they are mapped (default: distances between their ends)
+    :return: array of shape (K, 4, 4) of affine transform matrices"""
+
+    f = np.asarray(from_endpoints, dtype=float).reshape(-1, 4)
+    t = np.asarray(to_endpoints, dtype=float).reshape(-1, 4)
+    f_length = np.hypot(f[:, 2] - f[:, 0], f[:, 3] - f[:, 1]) if from_lengths is None else from_lengths
+    t_length = np.hypot(t[:, 2] - t[:, 0], t[:, 3] - t[:, 1]) if to_lengths is None else to_lengths
+    theta = np.arctan2(t[:, 3] - t[:, 1], t[:, 2] - t[:, 0]) - np.arctan2(f[:, 3] - f[:, 1], f[:, 2] - f[:, 0])
+    sf = t_length / f_length
+    return _similarity_matrices(sf * np.cos(theta), sf * np.sin(theta), f[:, :2], t[:, :2])
+
+
+def _similarity_matrices(a, b, from_origins, to_origins):
+    """ builds the matrices of similarity transforms x' = a x - b y + x_off, y' = b x + a y + y_off mapping
+    from_origins onto to_origins
+
+    :param a: scale times cosine of the rotation angles
+    :param b: scale times sine of the rotation angles
+    :param from_origins: array of shape (K, 2) of points
+    :param to_origins: array of shape (K, 2) of the transformed points
+    :return: array of shape (K, 4, 4) of affine transform matrices"""
+
+    m = np.zeros((len(a), 4, 4))
+    m[:, 0, 0] = a
+    m[:, 0, 1] = -b
+    m[:, 1, 0] = b
+    m[:, 1, 1] = a
+    m[:, 0, 3] = to_origins[:, 0] - a * from_origins[:, 0] + b * from_origins[:, 1]
+    m[:, 1, 3] = to_origins[:, 1] - b * from_origins[:, 0] - a * from_origins[:, 1]
+    m[:, 2, 2] = 1.
+    m[:, 3, 3] = 1.
+    return m
+
+
+@instrumentation.instrument
+def fit_transform_2d(from_points, to_points, affine=False):
+    """ computes the least squares similarity (or affine) transforms in the horizontal plane mapping control points
+    onto their known positions, for one or many frames at once
+
+    :param from_points: array of shape (N, 2) or (K, N, 2) of the control points in each frame
+    :param to_points: array of the same shape of the known positions of the control points
+    :param affine: if True an affine transform is fitted instead of a similarity (needs 3 points or more)
+    :return: array of shape (4, 4) or (K, 4, 4) of affine transform matrices and array of shape (N,) or (K, N) of the
+        distances between the transformed control points and their known positions"""
+
+    f = np.asarray(from_points, dtype=float)[..., :2]
+    t = np.asarray(to_points, dtype=float)[..., :2]
+    single = f.ndim == 2
+    f = f.reshape(-1, *f.shape[-2:])
+    t = t.reshape(f.shape)
+    if affine:
+        a = np.concatenate([f, np.ones(f.shape[:2] + (1,))], axis=2)
+        p = np.linalg.solve(np.einsum('kni,knj->kij', a, a), np.einsum('kni,knj->kij', a, t))
+        m = np.zeros((len(f), 4, 4))
+        m[:, :2, :2] = p[:, :2, :].transpose(0, 2, 1)
+        m[:, :2, 3] = p[:, 2, :]
+        m[:, 2, 2] = 1.
+        m[:, 3, 3] = 1.
     else:
-        return np.array([[a,b,c,xoff], [d,e,f,yoff], [g,h,i,zoff], [0.,0.,0.,1.]])
+        zf = f[..., 0] + 1j * f[..., 1]
+        zt = t[..., 0] + 1j * t[..., 1]
+        zf_mean = zf.mean(axis=1)
+        zt_mean = zt.mean(axis=1)
+        dzf = zf - zf_mean[:, None]
+        ab = np.sum((zt - zt_mean[:, None]) * np.conj(dzf), axis=1) / np.sum(np.abs(dzf) ** 2, axis=1)
+        m = _similarity_matrices(ab.real, ab.imag, np.column_stack([zf_mean.real, zf_mean.imag]),
+                                 np.column_stack([zt_mean.real, zt_mean.imag]))
+    transformed = np.einsum('kij,knj->kni', m[:, :2, :2], f) + m[:, None, :2, 3]
+    residuals = np.hypot(*(transformed - t).transpose(2, 0, 1))
+    return (m[0], residuals[0]) if single else (m, residuals)
 
 
 def plot_profile(ax=None, obj=None, name=''):
+    from shapely.geometry import LineString
+
     if type(obj) is LineString:
-        ax = plot_shapely_obj(ax=ax, obj=obj, color='k', linestyle='--', linewidth=0.75)
-        plot_shapely_obj(ax=ax, obj=Point(obj.coords[0]), marker='o', color='g')  # start
-        for i in range(1, len(obj.coords)):
-            plot_shapely_obj(ax=ax, obj=Point(obj.coords[i]), marker='x', color='grey')
-        plot_shapely_obj(ax=ax, obj=Point(obj.coords[-1]), marker='s', color='r')  # end
-        theta = np.arctan2(obj.coords[-1][1] - obj.coords[0][1], obj.coords[-1][0] - obj.coords[0][0]) * 180. / np.pi
-        ax.text(obj.centroid.coords[0][0], obj.centroid.coords[0][1], name, rotation=theta,
-                horizontalalignment='center', verticalalignment='top', multialignment='center')
-        ax.axis('equal')
+        ax = plot_profiles(ax=ax, objs=[obj], names=[name])
     return ax
 
 
-def transform_vtk(transform_matrix, infile, outfile=None):
+@instrumentation.instrument
+def plot_profiles(ax=None, objs=None, names=None):
+    """ plots profile lines with a constant number of artists: all the lines are drawn by a single LineCollection and
+    the start, intermediate and end vertices of all the profiles by one call to plot each, only the names are drawn
+    one by one
+    :param ax: matplotlib axes (a new figure is created if None)
+    :param objs: list of LineString objects
+    :param names: names of the profiles (default: no names)
+    :return: the axes"""
+
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    if ax is None:
+        fig, ax = plt.subplots()
+    lines = [np.asarray(obj.coords)[:, :2] for obj in objs]
+    if not lines:
+        return ax
+    ax.add_collection(LineCollection(lines, colors='k', linestyles='--', linewidths=0.75))
+    vertices = np.concatenate([line[1:] for line in lines])
+    ax.plot(vertices[:, 0], vertices[:, 1], linestyle='none', marker='x', color='grey')
+    starts = np.array([line[0] for line in lines])
+    ends = np.array([line[-1] for line in lines])
+    ax.plot(starts[:, 0], starts[:, 1], linestyle='none', marker='o', color='g')  # start
+    ax.plot(ends[:, 0], ends[:, 1], linestyle='none', marker='s', color='r')  # end
+    if names is not None:
+        theta = np.degrees(np.arctan2(ends[:, 1] - starts[:, 1], ends[:, 0] - starts[:, 0]))
+        for obj, name, angle in zip(objs, names, theta):
+            ax.text(obj.centroid.coords[0][0], obj.centroid.coords[0][1], name, rotation=angle,
+                    horizontalalignment='center', verticalalignment='top', multialignment='center')
+    ax.axis('equal')
+    return ax
+
+
+@instrumentation.instrument
+def transform_vtk(transform_matrix, infile, outfile=None, chunk_size=None):
     """ transforms a vtk file using an affine transform in 3D defined by the transform matrix
     :param transform_matrix: a 4x4 affine transform matrix
     :param infile: filename of a vtk file to transform
-    :param outfile: filename of the transformed vtk file"""
+    :param outfile: filename of the transformed vtk file
+    :param chunk_size: if not None, the points of a legacy vtk file (.vtk) are transformed by chunks of chunk_size
+        points without loading the mesh, so that memory use is bounded by the chunk size (see transform_legacy_vtk),
+        other formats are loaded with pyvista"""
 
     # TODO: if a 3x3 matrix is passed convert it to a (4x4) transform matrix with rotation on the z-axis
     #  and translations along the x and y-axis
     if np.shape(transform_matrix) == (4,4):
-        vtk_obj = pv.read(infile)
-        vtk_obj.transform(transform_matrix)
         if outfile is None:
             outfile = infile[:-4] + '_3D.vtk'
+        if chunk_size is not None and infile.lower().endswith('.vtk') and outfile.lower().endswith('.vtk'):
+            transform_legacy_vtk(transform_matrix, infile, outfile, chunk_size=chunk_size)
+            return
+        import pyvista as pv
+
+        vtk_obj = pv.read(infile)
+        vtk_obj.transform(transform_matrix, inplace=True)
         pv.save_meshio(outfile, vtk_obj)
     else:
-        print('invalid transform matrix')
\ No newline at end of file
+        logger.error('invalid transform matrix')
+
+
+@instrumentation.instrument
+def drape_points(points, line, start=0.):
+    """ maps the nodes of a 2D section onto a (multi-segment) profile line in one vectorized pass: the along-profile
+    x of each node is located on the polyline using the cumulative lengths of its segments, the cross-profile y is
+    applied along the normal of the segment and the elevation z is kept
+
+    :param points: array of shape (N, 3) of the local coordinates (x along the profile, y to the left of the profile,
+        z elevation) or of shape (N, 2) of the local coordinates (x, z) of the nodes
+    :param line: profile line, as a LineString or an array of shape (M, 2) of its vertices
+    :param start: distance along the line of the origin of the section (x=0)
+    :return: array of shape (N, 3) of the coordinates of the nodes (nodes beyond the ends of the line are placed on the
+        extension of the first or last segment)"""
+
+    points = np.asarray(points, dtype=float)
+    if points.shape[1] == 2:
+        points = np.column_stack([points[:, 0], np.zeros(len(points)), points[:, 1]])
+    vertices = np.asarray(line.coords if hasattr(line, 'coords') else line, dtype=float)[:, :2]
+    segments = np.diff(vertices, axis=0)
+    lengths = np.hypot(segments[:, 0], segments[:, 1])
+    keep = lengths > 0.
+    vertices = np.vstack([vertices[:-1][keep], vertices[-1:]])
+    segments = segments[keep]
+    if len(segments) == 0:
+        raise ValueError('the profile line has no segment of non zero length')
+    lengths = lengths[keep]
+    chainages = np.hstack([0., np.cumsum(lengths)])
+
+    # each segment maps (s, y) to x0 + s * dx - y * dy, y0 + s * dy + y * dx with (dx, dy) its unit direction
+    dx, dy = (segments / lengths[:, None]).T
+    x0 = vertices[:-1, 0] - chainages[:-1] * dx
+    y0 = vertices[:-1, 1] - chainages[:-1] * dy
+    s = points[:, 0] + start
+    j = np.clip(np.searchsorted(chainages, s, side='right') - 1, 0, len(segments) - 1)
+    dx, dy, y = dx[j], dy[j], points[:, 1]
+    draped = np.empty((len(points), 3))
+    draped[:, 0] = x0[j] + s * dx - y * dy
+    draped[:, 1] = y0[j] + s * dy + y * dx
+    draped[:, 2] = points[:, 2]
+    return draped
+
+
+@instrumentation.instrument
+def drape_vtk(line, infile, outfile=None, start=0.):
+    """ drapes the mesh of a 2D section stored in a vtk file onto a (multi-segment) profile line (see drape_points)
+    :param line: profile line, as a LineString or an array of shape (M, 2) of its vertices
+    :param infile: filename of a vtk file whose points are in the local (x, y, z) coordinates of the section
+    :param outfile: filename of the draped vtk file
+    :param start: distance along the line of the origin of the section (x=0)"""
+
+    import pyvista as pv
+
+    vtk_obj = pv.read(infile)
+    vtk_obj.points = drape_points(vtk_obj.points, line, start=start)
+    if outfile is None:
+        outfile = infile[:-4] + '_3D.vtk'
+    pv.save_meshio(outfile, vtk_obj)
+
+
+# dtypes of the points and of the field data arrays of binary legacy vtk files
+VTK_POINT_DTYPES = {b'float': '>f4', b'double': '>f8'}
+VTK_FIELD_DTYPES = {b'bit': 'u1', b'unsigned_char': 'u1', b'char': 'i1', b'unsigned_short': '>u2', b'short': '>i2',
+                    b'unsigned_int': '>u4', b'int': '>i4', b'unsigned_long': '>u8', b'long': '>i8',
+                    b'vtktypeint64': '>i8', b'vtktypeuint64': '>u8', b'float': '>f4', b'double': '>f8'}
+VTK_CHUNK_SIZE = 1 << 20
+
+
+def _legacy_vtk_points(f):
+    """ reads the header of a legacy vtk file up to its POINTS line
+
+    :param f: legacy vtk file opened in binary mode
+    :return: True if the file is binary, number of points, dtype of the coordinates and offset of the first point"""
+
+    if not f.readline().startswith(b'# vtk DataFile'):
+        raise ValueError('%s is not a legacy vtk file' % f.name)
+    f.readline()
+    binary = f.readline().strip().upper() == b'BINARY'
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError('no POINTS in %s' % f.name)
+        words = line.split()
+        if not words:
+            continue
+        key = words[0].upper()
+        if key == b'POINTS':
+            return binary, int(words[1]), np.dtype(VTK_POINT_DTYPES[words[2].lower()]), f.tell()
+        if key in (b'STRUCTURED_POINTS', b'RECTILINEAR_GRID') or (key == b'DATASET' and words[1].upper() in (
+                b'STRUCTURED_POINTS', b'RECTILINEAR_GRID')):
+            raise ValueError('%s has no explicit points' % f.name)
+        if key == b'FIELD' and binary:
+            # skip the binary field data arrays
+            n_arrays = int(words[2])
+            while n_arrays > 0:
+                words = f.readline().split()
+                if len(words) == 4 and words[3].lower() in VTK_FIELD_DTYPES:
+                    f.seek(int(words[1]) * int(words[2]) * np.dtype(VTK_FIELD_DTYPES[words[3].lower()]).itemsize, 1)
+                    n_arrays -= 1
+
+
+@instrumentation.instrument
+def transform_legacy_vtk(transform_matrix, infile, outfile, chunk_size=VTK_CHUNK_SIZE):
+    """ transforms the points of a legacy vtk file by chunks, without loading the mesh
+
+    The input file is copied to the output file (unless they are the same, in which case the file is transformed in
+    place) and the points of the output file are transformed chunk by chunk through a memory map (binary files) or
+    while the file is copied (ascii files), so that memory use is bounded by the chunk size. Only the coordinates of
+    the points are transformed, vectors and normals of the point data are left untouched.
+
+    :param transform_matrix: a 4x4 affine transform matrix
+    :param infile: filename of a legacy vtk file to transform
+    :param outfile: filename of the transformed vtk file
+    :param chunk_size: number of points transformed at once"""
+
+    m = np.asarray(transform_matrix, dtype=float)
+    rotation = m[:3, :3].T
+    translation = m[:3, 3]
+    with open(infile, 'rb') as f:
+        binary, n, dtype, offset = _legacy_vtk_points(f)
+        if not binary:
+            if os.path.abspath(infile) == os.path.abspath(outfile):
+                raise ValueError('ascii legacy vtk files cannot be transformed in place')
+            with open(outfile, 'wb') as g:
+                f.seek(0)
+                g.write(f.read(offset))
+                fmt = '%.9g' if dtype.itemsize == 4 else '%.17g'
+                values = []
+                remaining = 3 * n
+                while remaining > 0:
+                    line = f.readline()
+                    if not line:
+                        raise ValueError('missing points in %s' % infile)
+                    values.extend(line.split())
+                    if len(values) >= min(3 * chunk_size, remaining):
+                        # a point may be split over two lines
+                        k = len(values) - len(values) % 3
+                        points = np.array(values[:k], dtype=float).reshape(-1, 3) @ rotation + translation
+                        np.savetxt(g, points, fmt=fmt)
+                        values = values[k:]
+                        remaining -= k
+                        if instrumentation.enabled:
+                            instrumentation.count('chunks')
+                shutil.copyfileobj(f, g)
+            return
+    if os.path.abspath(infile) != os.path.abspath(outfile):
+        shutil.copyfile(infile, outfile)
+    points = np.memmap(outfile, dtype=dtype, mode='r+', offset=offset, shape=(n, 3))
+    for start in range(0, n, chunk_size):
+        chunk = points[start:start + chunk_size]
+        chunk[:] = chunk @ rotation + translation
+        if instrumentation.enabled:
+            instrumentation.count('chunks')
+    points.flush()
+    del points
+
+
+# name of the manifest of the files transformed by transform_vtk_batch and size of the blocks read to hash files
+VTK_MANIFEST = 'transform_vtk_manifest.json'
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def _file_hash(filename):
+    """ computes the sha256 hash of the content of a file
+
+    :param filename: file name
+    :return: hexadecimal hash"""
+
+    h = sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _transform_vtk_job(job):
+    """ transforms a vtk file unless the output is up to date according to its entry in the manifest
+
+    :param job: transform matrix, input file, output file and manifest entry of the output file (or None)
+    :return: report of the job and new manifest entry of the output file (None if the job failed)"""
+
+    transform_matrix, infile, outfile, entry = job
+    start = time.perf_counter()
+    report = {'infile': infile, 'outfile': outfile, 'status': 'transformed', 'seconds': 0., 'error': None}
+    try:
+        matrix = np.asarray(transform_matrix, dtype=float)
+        if matrix.shape != (4, 4):
+            raise ValueError('invalid transform matrix')
+        stat = os.stat(infile)
+        entry = dict(entry or {})
+        # the entry only applies to the input file it was recorded for
+        same_input = entry.get('infile') == os.path.abspath(infile)
+        if same_input and entry.get('input_size') == stat.st_size and entry.get('input_mtime_ns') == stat.st_mtime_ns:
+            input_hash = entry['input_hash']
+        else:
+            input_hash = _file_hash(infile)
+        matrix_hash = sha256(matrix.tobytes()).hexdigest()
+        up_to_date = (same_input and entry.get('input_hash') == input_hash and entry.get('matrix_hash') == matrix_hash
+                      and os.path.exists(outfile) and entry.get('output_size') == os.stat(outfile).st_size
+                      and entry.get('output_mtime_ns') == os.stat(outfile).st_mtime_ns)
+        if up_to_date:
+            report['status'] = 'skipped'
+        else:
+            transform_vtk(matrix, infile, outfile)
+        out_stat = os.stat(outfile)
+        entry = {'infile': os.path.abspath(infile), 'input_hash': input_hash, 'input_size': stat.st_size,
+                 'input_mtime_ns': stat.st_mtime_ns, 'matrix_hash': matrix_hash, 'output_size': out_stat.st_size,
+                 'output_mtime_ns': out_stat.st_mtime_ns}
+    except Exception as e:
+        report['status'] = 'error'
+        report['error'] = '%s: %s' % (type(e).__name__, e)
+        entry = None
+    report['seconds'] = time.perf_counter() - start
+    return report, entry
+
+
+@instrumentation.instrument
+def transform_vtk_batch(jobs, n_jobs=1, manifest=None, force=False):
+    """ transforms many vtk files across a pool of processes, skipping the files whose output is up to date
+
+    A manifest records, for each output file, the hashes of the content of its input file and of its transform matrix
+    along with the size and modification time of the input and output files. A file is only transformed again if its
+    input or matrix changed or if its output was modified or removed.
+
+    :param jobs: list of (transform_matrix, infile, outfile) tuples (outfile may be None, see transform_vtk)
+    :param n_jobs: number of processes (1 to transform in the calling process, 0 or less to use all the cpus)
+    :param manifest: filename of the manifest (default: VTK_MANIFEST in the directory of the first output file)
+    :param force: if True all the files are transformed
+    :return: list of reports (infile, outfile, status, seconds, error) of the jobs, in the order of jobs"""
+
+    jobs = [(m, infile, infile[:-4] + '_3D.vtk' if outfile is None else outfile) for m, infile, outfile in jobs]
+    if not jobs:
+        return []
+    if manifest is None:
+        manifest = os.path.join(os.path.dirname(os.path.abspath(jobs[0][2])), VTK_MANIFEST)
+    entries = {}
+    if os.path.exists(manifest):
+        with open(manifest, 'r') as f:
+            entries = json.load(f)
+    tasks = [(m, infile, outfile, None if force else entries.get(os.path.abspath(outfile)))
+             for m, infile, outfile in jobs]
+
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count()
+    if n_jobs == 1:
+        results = list(map(_transform_vtk_job, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_transform_vtk_job, tasks))
+
+    for (_, _, outfile), (_, entry) in zip(jobs, results):
+        if entry is None:
+            entries.pop(os.path.abspath(outfile), None)
+        else:
+            entries[os.path.abspath(outfile)] = entry
+    tmp_file = manifest + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(entries, f, indent=1)
+    os.replace(tmp_file, manifest)
+    return [report for report, _ in results]
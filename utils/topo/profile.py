@@ -1,10 +1,38 @@
 # O.KAUFMANN - 2009-2020
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha1
+import logging
+import os
 import numpy as np
 from scipy.interpolate import PPoly, PchipInterpolator
 from scipy.integrate import quad
-from scipy.optimize import root
+from utils import instrumentation
 
+# orders of the Gauss-Legendre rules used by cclength_pieces: the low order rule is only used to estimate the error
+GL_ORDER = 16
+GL_LOW_ORDER = 8
+GL_MAX_SPLITS = 30
+# maximum number of intervals integrated in a pass and smallest relative tolerance on the lengths, so that a tolerance
+# that cannot be met (e.g. epsabs=epsrel=0 in floating point) does not exhaust the memory
+GL_MAX_INTERVALS = 1 << 20
+GL_MIN_RTOL = 1.e-14
+GL_NODES = np.polynomial.legendre.leggauss(GL_ORDER)
+GL_LOW_NODES = np.polynomial.legendre.leggauss(GL_LOW_ORDER)
+# size of the length to abscissa tables and settings of the Newton refinement used by cclength2abs
+INVERSE_TABLE_SIZE = 8
+NEWTON_MAX_ITER = 20
+# distances beyond the ends of a curve by less than this fraction of its length are moved to its ends, as the length is
+# only known within the tolerance of the quadrature (e.g. the last point of linspace(0, nominal_length, n))
+LENGTH_RTOL = 1.e-10
+# maximum number of profile curves kept in memory by profile_curve
+PROFILE_CURVE_CACHE_SIZE = 64
+_profile_curves = OrderedDict()
 
+logger = logging.getLogger(__name__)
+
+
+@instrumentation.instrument
 def cclength(coefs, x_end=1.0):
     """ computes the length along a cubic curve defined by the coefficients of its equation z=f(x) from 0 to x_end
 
@@ -16,27 +44,412 @@ def cclength(coefs, x_end=1.0):
     """
     # g = lambda x: (1 + (coefs[2] + 2 * coefs[1] * (x) + 3 * coefs[0] * (x) ** 2) ** 2) ** 0.5
     def g(x): return (1 + (coefs[2] + 2 * coefs[1] * x + 3 * coefs[0] * x ** 2) ** 2) ** 0.5
+    if instrumentation.enabled:
+        length, _, info = quad(g, 0, x_end, epsrel=0.001, full_output=1)[:3]
+        instrumentation.count('quad_evaluations', info['neval'])
+        return length
     length = quad(g, 0, x_end, epsrel=0.001)
     return length[0]
 
 
-def cclength2abs(coefs, length):
-    """ computes the x value of the point at a distance computed along a cubic curve defined by its coefficients
+@instrumentation.instrument
+def cclength2abs(coefs, length, x_end=None, tol=1.e-9):
+    """ computes the x value of the points at distances computed along a cubic curve defined by its coefficients
+
+    All the distances are solved at once: a first guess is interpolated in a monotone table of lengths computed at
+    INVERSE_TABLE_SIZE sub-intervals of [0, x_end], then refined with vectorized Newton iterations using the exact
+    derivative of the length (i.e. the arc length element of the cubic) until the length at each x value matches the
+    requested distance within tol. The x values agree with those of the former scipy.optimize.root solution within
+    1e-6 (in the units of x).
 
     :param coefs: coefficients of the cubic curve
     :type coefs: list
-    :param length: length of the portion of the curve
-    :type length: float
-    :return: x value of the end point of the portion of the curve starting at x=0 and of given length
-    :rtype: float
+    :param length: length(s) of the portion of the curve
+    :type length: float, numpy.array
+    :param x_end: x value of the end of the piece of curve, the solutions are sought in [0, x_end] (default: max(length)
+        as the length of the curve from 0 to x is larger than x)
+    :type x_end: float
+    :param tol: tolerance on the lengths
+    :type tol: float
+    :return: x value(s) of the end point of the portion of the curve starting at x=0 and of given length
+    :rtype: float, numpy.array
     """
 
-    def f(x): return length - cclength(coefs, x)
+    coefs = np.asarray(coefs, dtype=float)
+    lengths = np.asarray(length, dtype=float)
+    if x_end is None:
+        x_end = max(np.max(lengths, initial=0.), 0.)
+    x = _cclengths2abs(coefs[None, :], np.ravel(lengths), np.zeros(lengths.size, dtype=int), np.array([x_end]), tol)
+    return x.reshape(lengths.shape) if lengths.ndim else x[0]
+
+
+@instrumentation.instrument
+def _cclengths2abs(coefs, lengths, pieces, x_ends, tol=1.e-9):
+    """ computes the x values of points at given distances along the pieces of a piecewise cubic curve
+
+    :param coefs: coefficients of the cubic pieces, one row per piece
+    :type coefs: numpy.array
+    :param lengths: lengths of the portions of the pieces starting at x=0
+    :type lengths: numpy.array
+    :param pieces: index of the piece along which each length is measured
+    :type pieces: numpy.array
+    :param x_ends: x values of the ends of the pieces
+    :type x_ends: numpy.array
+    :param tol: tolerance on the lengths
+    :type tol: float
+    :return: x values of the end points of the portions of the pieces
+    :rtype: numpy.array
+    """
+
+    # monotone table of the lengths of each piece measured at regularly spaced x values
+    n = INVERSE_TABLE_SIZE
+    x_table = x_ends[:, None] * np.linspace(0., 1., n + 1)
+    sub_lengths = cclength_pieces(np.repeat(coefs, n, axis=0), x_table[:, 1:].ravel(), x_table[:, :-1].ravel())
+    length_table = np.hstack([np.zeros((len(coefs), 1)), np.cumsum(sub_lengths.reshape(-1, n), axis=1)])
+
+    # first guess by linear interpolation in the table
+    k = np.clip(np.sum(length_table[pieces, 1:-1] <= lengths[:, None], axis=1), 0, n - 1)
+    x_0 = x_table[pieces, k]
+    l_0 = length_table[pieces, k]
+    x_1 = x_table[pieces, k + 1]
+    l_1 = length_table[pieces, k + 1]
+    x = x_0 + (lengths - l_0) * (x_1 - x_0) / np.where(l_1 > l_0, l_1 - l_0, 1.)
+    x = np.clip(x, 0., x_ends[pieces])
+
+    # Newton refinement of the points that do not match the lengths yet
+    c = coefs[pieces]
+    todo = np.arange(len(lengths))
+    for _ in range(NEWTON_MAX_ITER):
+        residuals = l_0[todo] + cclength_pieces(c[todo], x[todo], x_0[todo]) - lengths[todo]
+        slopes = c[todo, 2] + x[todo] * (2. * c[todo, 1] + 3. * c[todo, 0] * x[todo])
+        x[todo] = np.clip(x[todo] - residuals / np.sqrt(1. + slopes ** 2), 0., x_ends[pieces[todo]])
+        todo = todo[np.abs(residuals) > tol]
+        if instrumentation.enabled:
+            instrumentation.count('newton_iterations')
+            instrumentation.count('newton_evaluations', len(residuals))
+        if len(todo) == 0:
+            break
+    return x
+
+
+def _gl_integrate(coefs, a, b, nodes):
+    """ integrates the arc length element of cubic curves on [a, b] with a Gauss-Legendre rule
+
+    :param coefs: coefficients of the cubic curves, one row per interval
+    :type coefs: numpy.array
+    :param a: lower bounds of the intervals
+    :type a: numpy.array
+    :param b: upper bounds of the intervals
+    :type b: numpy.array
+    :param nodes: nodes and weights of the Gauss-Legendre rule on [-1, 1]
+    :type nodes: tuple
+    :return: lengths of the portions of the curves
+    :rtype: numpy.array
+    """
+
+    u, w = nodes
+    half = 0.5 * (b - a)
+    t = half[:, None] * u + (0.5 * (a + b))[:, None]
+    slope = coefs[:, 2, None] + t * (2. * coefs[:, 1, None] + 3. * coefs[:, 0, None] * t)
+    return half * (np.sqrt(1. + slope ** 2) @ w)
+
+
+@instrumentation.instrument
+def cclength_pieces(coefs, x_ends, x_starts=0., epsabs=1.e-9, epsrel=1.e-10):
+    """ computes the lengths along a set of cubic curves defined by the coefficients of their equations z=f(x)
+    from x_start (default 0) to x_end, all at once
+
+    Each length is integrated with a 16-point Gauss-Legendre rule. The error is estimated as the difference with an
+    8-point rule and the intervals for which it exceeds max(epsabs, epsrel * length) are bisected, all in vectorized
+    passes, until the estimate is met (or after GL_MAX_SPLITS passes, or when a pass would integrate more than
+    GL_MAX_INTERVALS intervals). As the estimate bounds the error of the lower order rule, the error on each returned
+    length is below max(epsabs, epsrel * length, GL_MIN_RTOL * length).
+
+    :param coefs: coefficients of the cubic curves, one row per curve (e.g. PPoly.c.T)
+    :type coefs: numpy.array
+    :param x_ends: lengths are computed for the portions of the curves whose ends are at x=0 and x=x_end
+    :type x_ends: float, numpy.array
+    :param x_starts: x values of the starts of the portions of the curves
+    :type x_starts: float, numpy.array
+    :param epsabs: absolute error tolerance
+    :type epsabs: float
+    :param epsrel: relative error tolerance
+    :type epsrel: float
+    :return: lengths of the portions of the curves
+    :rtype: numpy.array
+    """
+
+    coefs = np.atleast_2d(np.asarray(coefs, dtype=float))
+    x_ends = np.broadcast_to(np.asarray(x_ends, dtype=float), (len(coefs),))
+    lengths = np.zeros(len(coefs))
+    piece = np.arange(len(coefs))
+    a = np.broadcast_to(np.asarray(x_starts, dtype=float), (len(coefs),)).copy()
+    b = x_ends.copy()
+    tol = None
+    for split in range(GL_MAX_SPLITS):
+        high = _gl_integrate(coefs[piece], a, b, GL_NODES)
+        low = _gl_integrate(coefs[piece], a, b, GL_LOW_NODES)
+        if instrumentation.enabled:
+            instrumentation.count('gl_passes')
+            instrumentation.count('gl_evaluations', len(piece) * (GL_ORDER + GL_LOW_ORDER))
+        if tol is None:
+            # tolerance on each piece, shared among its sub-intervals in proportion to their widths
+            tol = np.maximum(np.maximum(epsabs, epsrel * np.abs(high)), GL_MIN_RTOL * np.abs(high))
+            tol /= np.maximum(np.abs(b - a), np.finfo(float).tiny)
+        done = np.abs(high - low) <= tol[piece] * np.abs(b - a)
+        if split == GL_MAX_SPLITS - 1 or 2 * np.count_nonzero(~done) > GL_MAX_INTERVALS:
+            # last pass: the estimates of the intervals that did not converge are kept
+            done[:] = True
+        lengths += np.bincount(piece[done], weights=high[done], minlength=len(coefs))
+        if done.all():
+            break
+        piece, a, b = piece[~done], a[~done], b[~done]
+        mid = 0.5 * (a + b)
+        piece, a, b = np.concatenate([piece, piece]), np.concatenate([a, mid]), np.concatenate([mid, b])
+    return lengths
+
+
+class ProfileCurve:
+    """ curve defined by a set of known points and interpolated as a pchip
+
+    The interpolator, the coefficients of its cubic pieces and their cumulative lengths are computed once when the
+    curve is built so that the curve may be queried many times at a low cost. Use profile_curve to get a curve from
+    the cache rather than building it again.
+
+    :param known_points: points, the first one must be at x=0
+    :type known_points: list, numpy.array
+    """
+
+    def __init__(self, known_points):
+        known_points = _as_known_points(known_points)
+        if known_points[0][0] != 0:
+            raise ValueError('The first known point must be at x=0.')
+        self.x = np.array(known_points[0], dtype=float)
+        self.z = np.array(known_points[1], dtype=float)
+        self.interp = PchipInterpolator(self.x, self.z)
+        self.coefs = _pchip_coefs(self.interp)
+        self.length_of_pieces = cclength_pieces(self.coefs, np.diff(self.x))
+        self.cumulative_lengths = np.hstack([np.array([0.]), np.cumsum(self.length_of_pieces)])
+        for a in (self.x, self.z, self.coefs, self.length_of_pieces, self.cumulative_lengths):
+            a.flags.writeable = False
+
+    @property
+    def length(self):
+        """ length of the curve from the first to the last known point """
+        return self.cumulative_lengths[-1]
+
+    def lengths(self):
+        """ computes the distance from the first point and each known point along the curve
+
+        :return: list of distances along the curve
+        :rtype: numpy.array
+        """
+
+        return self.cumulative_lengths.copy()
+
+    def length_at(self, x):
+        """ computes the distance from the first point along the curve of the points at given x values
+
+        :param x: x value(s) of the points, nan is returned outside the range of the known points
+        :type x: float, numpy.array
+        :return: distance(s) along the curve
+        :rtype: float, numpy.array
+        """
+
+        x = np.asarray(x, dtype=float)
+        xs = np.ravel(x)
+        j = np.clip(np.searchsorted(self.x, xs, side='right') - 1, 0, len(self.coefs) - 1)
+        lengths = self.cumulative_lengths[j] + cclength_pieces(self.coefs[j], xs - self.x[j])
+        lengths[(xs < self.x[0]) | (xs > self.x[-1]) | np.isnan(xs)] = np.nan
+        return lengths.reshape(x.shape) if x.ndim else lengths[0]
+
+    def xz_at(self, distances):
+        """ computes [x,z] of points distributed at set distances along the curve
+
+        The pieces on which the points lie are found by a binary search in the cumulative lengths of the pieces and
+        the points are then solved all at once, grouped by piece.
+
+        :param distances: distances from the origin of the curve to the points whose x_value are sought
+        :type distances: numpy.array
+        :return: list of found points coordinates along the curve, in the order of distances (nan for the points
+            lying outside the curve, beyond the tolerance LENGTH_RTOL)
+        :rtype: numpy.array
+        """
+
+        distances = np.ravel(np.asarray(distances, dtype=float))
+        xz = np.full((len(distances), 2), np.nan)
+        tol = LENGTH_RTOL * self.length
+        inside = (distances >= -tol) & (distances <= self.length + tol)
+        d = np.clip(distances[inside], 0., self.length)
+        j = np.minimum(np.searchsorted(self.cumulative_lengths[1:], d, side='left'), len(self.coefs) - 1)
+        pieces, j_inv = np.unique(j, return_inverse=True)
+        x = self.x[j] + _cclengths2abs(self.coefs[pieces], d - self.cumulative_lengths[j], j_inv,
+                                       self.x[pieces + 1] - self.x[pieces])
+        xz[inside, 0] = x
+        xz[inside, 1] = self.interp(x)
+        return xz
+
+
+class IncrementalProfile:
+    """ pchip curve whose known points are appended one at a time, e.g. while a profile is surveyed
+
+    As pchip slopes only depend on the neighbouring points, appending a point only changes the last two pieces of the
+    curve: only their lengths are computed again and the cumulative lengths are updated from there, so that the cost
+    of an update does not depend on the number of known points.
+
+    :param known_points: first points of the profile, the first one must be at x=0
+    :type known_points: list, numpy.array
+    :param capacity: initial number of points for which memory is allocated
+    :type capacity: int
+    """
+
+    def __init__(self, known_points=None, capacity=1024):
+        self._x = np.empty(capacity)
+        self._z = np.empty(capacity)
+        self._cumulative_lengths = np.zeros(capacity)
+        self._n = 0
+        if known_points is not None:
+            self.extend(known_points)
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def x(self):
+        """ x values of the known points """
+        return self._x[:self._n]
+
+    @property
+    def z(self):
+        """ z values of the known points """
+        return self._z[:self._n]
+
+    @property
+    def length(self):
+        """ length of the curve from the first to the last known point """
+        return self._cumulative_lengths[self._n - 1] if self._n else 0.
+
+    def lengths(self):
+        """ computes the distance from the first point and each known point along the curve
+
+        :return: list of distances along the curve
+        :rtype: numpy.array
+        """
+
+        return self._cumulative_lengths[:self._n].copy()
+
+    def append(self, x, z):
+        """ appends a known point at the end of the profile and updates the lengths of the affected pieces
+
+        :param x: x value of the point, larger than the x value of the last known point
+        :type x: float
+        :param z: z value of the point
+        :type z: float
+        """
+
+        n = self._n
+        if n == 0 and x != 0:
+            raise ValueError('The first known point must be at x=0.')
+        if n > 0 and x <= self._x[n - 1]:
+            raise ValueError('Known points must be appended with increasing x values.')
+        if n == len(self._x):
+            self._x = np.hstack([self._x, np.empty(n)])
+            self._z = np.hstack([self._z, np.empty(n)])
+            self._cumulative_lengths = np.hstack([self._cumulative_lengths, np.zeros(n)])
+        self._x[n] = x
+        self._z[n] = z
+        n += 1
+        self._n = n
+        if n > 1:
+            # the last two pieces are those of a pchip through the last four points
+            start = max(0, n - 4)
+            first = max(0, n - 3)
+            x_w = self._x[start:n]
+            coefs = _pchip_coefs(PchipInterpolator(x_w, self._z[start:n]))[first - start:]
+            lengths = cclength_pieces(coefs, np.diff(x_w)[first - start:])
+            self._cumulative_lengths[first + 1:n] = self._cumulative_lengths[first] + np.cumsum(lengths)
+
+    def extend(self, known_points):
+        """ appends known points at the end of the profile
+
+        :param known_points: points
+        :type known_points: list, numpy.array
+        """
+
+        known_points = _as_known_points(known_points)
+        for x, z in zip(known_points[0], known_points[1]):
+            self.append(x, z)
 
-    x = root(f, length)
-    return x.x
+    def curve(self):
+        """ gets the curve through the current known points
 
+        :return: the curve
+        :rtype: ProfileCurve
+        """
 
+        return profile_curve(np.vstack([self.x, self.z]))
+
+
+def _pchip_coefs(interp):
+    """ gets the coefficients of the cubic pieces of a pchip interpolator
+
+    :param interp: pchip interpolator
+    :type interp: scipy.interpolate.PchipInterpolator
+    :return: coefficients, one row per piece
+    :rtype: numpy.array
+    """
+
+    try:
+        poly = PPoly.from_bernstein_basis(interp, extrapolate=None)
+    except TypeError:
+        # already a PPoly instance, nothing to do
+        poly = interp
+    return poly.c.T
+
+
+def _as_known_points(known_points):
+    """ converts a list of [x, z] points into an array whose first row holds x values and second row z values
+
+    :param known_points: points
+    :type known_points: list, numpy.array
+    :return: known points
+    :rtype: numpy.array
+    """
+
+    if type(known_points) is list:
+        known_points = np.array(known_points).T
+    return known_points
+
+
+@instrumentation.instrument
+def profile_curve(known_points):
+    """ gets the pchip curve defined by a set of known points, from a cache of the last PROFILE_CURVE_CACHE_SIZE
+    curves (least recently used curves are evicted first)
+
+    :param known_points: points, the first one must be at x=0
+    :type known_points: list, numpy.array
+    :return: the curve
+    :rtype: ProfileCurve
+    """
+
+    known_points = np.ascontiguousarray(_as_known_points(known_points), dtype=float)
+    key = (known_points.shape, sha1(known_points.tobytes()).hexdigest())
+    try:
+        _profile_curves.move_to_end(key)
+        if instrumentation.enabled:
+            instrumentation.count('cache_hits')
+        return _profile_curves[key]
+    except KeyError:
+        if instrumentation.enabled:
+            instrumentation.count('cache_misses')
+        curve = ProfileCurve(known_points)
+        _profile_curves[key] = curve
+        if len(_profile_curves) > PROFILE_CURVE_CACHE_SIZE:
+            _profile_curves.popitem(last=False)
+        return curve
+
+
+@instrumentation.instrument
 def cclength2xz(known_points, distances):
     """ computes [x,z] of points distributed at set distances along a curve defined by a set of known points
     and interpolated as a pchip
@@ -45,48 +458,18 @@ def cclength2xz(known_points, distances):
     :type known_points: list, numpy.array
     :param distances: distances from the origin of the curve to the points whose x_value are sought
     :type distances: numpy.array
-    :return: list of found points coordinates along the curve
+    :return: list of found points coordinates along the curve, in the order of distances (nan for the points
+        lying outside the curve)
     :rtype: numpy.array
     """
-    if type(known_points) is list:
-        known_points = np.array(known_points).T
-    distances = np.array(sorted(distances))
+    known_points = _as_known_points(known_points)
     if known_points[0][0] != 0:
-        print('Error: The first known point must be at x=0.')
+        logger.error('The first known point must be at x=0.')
         return -1
-    x_i = np.array(known_points[0])
-    y_i = np.array(known_points[1])
-    interp = PchipInterpolator(x_i, y_i)
-    try:
-        poly = PPoly.from_bernstein_basis(interp, extrapolate=None)
-    except TypeError:
-        # already a PPoly instance, nothing to do
-        poly = interp
-    coefs = poly.c.T
-    number_of_points = len(distances)
-    number_of_pieces = len(coefs)
-    length_of_pieces = []
-    for j in range(number_of_pieces):
-        length_of_pieces.append(cclength(coefs[j], x_i[j + 1] - x_i[j]))
-    i = 0
-    j = 0
-    xz = np.array([[np.nan, np.nan]] * number_of_points)
-    while i < number_of_points:
-        if distances[i] <= length_of_pieces[j]:
-            xz[i, 0] = x_i[j] + cclength2abs(coefs[j], distances[i])
-            xz[i, 1] = interp(xz[i, 0])
-            i += 1
-        elif j < number_of_pieces - 1:
-            distances = distances - length_of_pieces[j]
-            j += 1
-        else:
-            for k in range(i, number_of_points):
-                xz[k, 0] = np.nan
-                xz[k, 1] = np.nan
-            break
-    return xz
+    return profile_curve(known_points).xz_at(distances)
 
 
+@instrumentation.instrument
 def cclengths(known_points):
     """ computes the distance from the first point and each given point along a curve defined
     by this set of known points and interpolated as a pchip
@@ -96,25 +479,108 @@ def cclengths(known_points):
     :return: list of distances along the curve
     :rtype: numpy.array
     """
-    if type(known_points) is list:
-        known_points = np.array(known_points).T
+    known_points = _as_known_points(known_points)
     if known_points[0][0] != 0:
-        print('Error: The first known point must be at x=0.')
+        logger.error('The first known point must be at x=0.')
         return -1
-    x_i = np.array(known_points[0])
-    y_i = np.array(known_points[1])
-    interp = PchipInterpolator(x_i, y_i)
-    try:
-        poly = PPoly.from_bernstein_basis(interp, extrapolate=None)
-    except TypeError:
-        # already a PPoly instance, nothing to do
-        poly = interp
-    coefs = poly.c.T
-    number_of_pieces = len(coefs)
-    length_of_pieces = []
-    for j in range(number_of_pieces):
-        length_of_pieces.append(cclength(coefs[j], x_i[j + 1] - x_i[j]))
-    return np.hstack([np.array([0]), np.cumsum(np.array(length_of_pieces))])
+    return profile_curve(known_points).lengths()
+
+
+def _split_ragged(values, offsets=None):
+    """ splits a packed array into a list of arrays according to offsets, lists are returned as is
+
+    :param values: packed array or list of arrays
+    :type values: list, numpy.array
+    :param offsets: start of each array in values followed by the end of the last one
+    :type offsets: numpy.array
+    :return: list of arrays
+    :rtype: list
+    """
+
+    if offsets is None:
+        return list(values)
+    offsets = np.asarray(offsets)
+    return [values[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def _cclength2xz_chunk(tasks):
+    """ computes [x,z] of points at set distances along a chunk of profiles, errors are returned instead of raised
+
+    :param tasks: known points, distances of each profile of the chunk and whether the known points are given as [x, z]
+        rows to convert to an array of x and z values
+    :type tasks: list
+    :return: found points coordinates and error message (None if no error) for each profile
+    :rtype: list
+    """
+
+    results = []
+    for known_points, distances, rows in tasks:
+        try:
+            if rows:
+                known_points = np.asarray(known_points, dtype=float).T
+            results.append((ProfileCurve(known_points).xz_at(distances), None))
+        except Exception as e:
+            results.append((None, '%s: %s' % (type(e).__name__, e)))
+    return results
+
+
+@instrumentation.instrument
+def batch_cclength2xz(profiles, distances, n_jobs=1, profile_offsets=None, distance_offsets=None, chunk_size=None):
+    """ computes [x,z] of points distributed at set distances along many curves defined by sets of known points
+    and interpolated as pchips, spreading the curves across a pool of processes
+
+    :param profiles: known points of each profile as a list of known points (see cclength2xz) or as an array of
+        [x, z] rows of all the profiles packed together (see profile_offsets)
+    :type profiles: list, numpy.array
+    :param distances: distances along each profile as a list of arrays, as a packed array (see distance_offsets)
+        or as a single array of distances shared by all profiles
+    :type distances: list, numpy.array
+    :param n_jobs: number of processes (1 to compute in the calling process, 0 or less to use all the cpus)
+    :type n_jobs: int
+    :param profile_offsets: start of each profile in the packed profiles followed by the end of the last one
+    :type profile_offsets: numpy.array
+    :param distance_offsets: start of the distances of each profile in the packed distances followed by the end of the
+        last one
+    :type distance_offsets: numpy.array
+    :param chunk_size: number of profiles sent at once to a process (default: about 4 chunks per process)
+    :type chunk_size: int
+    :return: found points coordinates of all the profiles packed together in the order of the profiles (nan for
+        profiles in error), offsets of the points of each profile and error messages by profile index
+    :rtype: tuple
+    """
+
+    if profile_offsets is not None:
+        profiles = np.asarray(profiles, dtype=float)
+    profiles = _split_ragged(profiles, profile_offsets)
+    # known points given as [x, z] rows are converted in the workers, so that malformed profiles are reported
+    rows = [type(p) is list or profile_offsets is not None for p in profiles]
+    if distance_offsets is None and len(distances) and np.ndim(distances[0]) == 0:
+        distances = [distances] * len(profiles)
+    distances = _split_ragged(distances, distance_offsets)
+    if len(distances) != len(profiles):
+        raise ValueError('Expected distances for %d profiles, got %d.' % (len(profiles), len(distances)))
+    offsets = np.hstack([np.array([0]), np.cumsum([len(d) for d in distances], dtype=np.int64)])
+
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count()
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(profiles) // (4 * n_jobs)))
+    tasks = list(zip(profiles, distances, rows))
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+    if n_jobs == 1:
+        results = map(_cclength2xz_chunk, chunks)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_cclength2xz_chunk, chunks))
+
+    xz = np.full((offsets[-1], 2), np.nan)
+    errors = {}
+    for i, (xz_i, error) in enumerate(r for chunk in results for r in chunk):
+        if error is None:
+            xz[offsets[i]:offsets[i + 1]] = xz_i
+        else:
+            errors[i] = error
+    return xz, offsets, errors
 
 
 if __name__ == '__main__':
@@ -0,0 +1,142 @@
+from itertools import chain
+import numpy as np
+from scipy.spatial import cKDTree
+from utils import instrumentation
+
+
+def _as_xy(points):
+    """ converts points to an array of x, y coordinates
+
+    :param points: array of shape (N, 2) or (N, 3), shapely LineString or Point
+    :type points: numpy.array, shapely.geometry.LineString
+    :return: array of shape (N, 2) of x, y coordinates
+    :rtype: numpy.array
+    """
+
+    if hasattr(points, 'coords'):
+        points = points.coords
+    return np.asarray(points, dtype=float).reshape(-1, np.shape(points)[-1])[:, :2]
+
+
+class SpatialIndex:
+    """ spatial index over an array of points (kd-tree) answering bulk nearest neighbour, radius, bounding box and
+    profile corridor queries
+
+    :param xy: coordinates of the indexed points, array of shape (N, 2) (or (N, 3), z is ignored)
+    :type xy: numpy.array
+    :param leafsize: number of points in the leaves of the kd-tree
+    :type leafsize: int
+    """
+
+    def __init__(self, xy, leafsize=16):
+        self.xy = _as_xy(xy)
+        self.tree = cKDTree(self.xy, leafsize=leafsize)
+
+    def __len__(self):
+        return len(self.xy)
+
+    @instrumentation.instrument
+    def nearest(self, points, k=1, max_distance=np.inf, workers=1):
+        """ finds the nearest indexed points of each query point
+
+        :param points: query points, array of shape (M, 2)
+        :type points: numpy.array
+        :param k: number of neighbours
+        :type k: int
+        :param max_distance: only neighbours closer than max_distance are returned
+        :type max_distance: float
+        :param workers: number of threads (-1 for all the cpus)
+        :type workers: int
+        :return: distances and indices of the neighbours, of shape (M,) if k=1 or (M, k) (inf and len(self) for missing
+            neighbours)
+        :rtype: tuple
+        """
+
+        return self.tree.query(_as_xy(points), k=k, distance_upper_bound=max_distance, workers=workers)
+
+    @instrumentation.instrument
+    def within_radius(self, points, radius):
+        """ finds the indexed points lying within a radius of each query point
+
+        :param points: query points, array of shape (M, 2)
+        :type points: numpy.array
+        :param radius: radius
+        :type radius: float
+        :return: indices of the query points, indices of the indexed points and distances between them, sorted by
+            query point then indexed point
+        :rtype: tuple
+        """
+
+        pairs = cKDTree(_as_xy(points)).sparse_distance_matrix(self.tree, radius, output_type='ndarray')
+        pairs.sort(order=['i', 'j'])
+        return pairs['i'], pairs['j'], pairs['v']
+
+    @instrumentation.instrument
+    def within_bbox(self, bboxes):
+        """ finds the indexed points lying in bounding boxes
+
+        :param bboxes: bounding box (xmin, ymin, xmax, ymax) or array of shape (M, 4) of bounding boxes
+        :type bboxes: tuple, numpy.array
+        :return: indices of the points in the bounding box, or indices of the bounding boxes and indices of the points
+            they hold if several bounding boxes are given
+        :rtype: numpy.array, tuple
+        """
+
+        single = np.ndim(bboxes) == 1
+        bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+        centers = 0.5 * (bboxes[:, :2] + bboxes[:, 2:])
+        half_sizes = 0.5 * (bboxes[:, 2:] - bboxes[:, :2])
+        # candidates are found in the square enclosing each box (chebyshev distance), with the radius of the box
+        candidates = self.tree.query_ball_point(centers, half_sizes.max(axis=1), p=np.inf)
+        counts = np.fromiter(map(len, candidates), dtype=int, count=len(candidates))
+        i = np.repeat(np.arange(len(bboxes)), counts)
+        j = np.fromiter(chain.from_iterable(candidates), dtype=int, count=counts.sum())
+        inside = np.all(np.abs(self.xy[j] - centers[i]) <= half_sizes[i], axis=1)
+        i, j = i[inside], j[inside]
+        order = np.lexsort((j, i))
+        i, j = i[order], j[order]
+        return j if single else (i, j)
+
+    @instrumentation.instrument
+    def corridor(self, line, distance):
+        """ finds the indexed points lying within a distance of a profile line and projects them on the line
+
+        :param line: profile line, as a LineString or an array of shape (K, 2) of its vertices
+        :type line: shapely.geometry.LineString, numpy.array
+        :param distance: half width of the corridor
+        :type distance: float
+        :return: indices of the points sorted by chainage, chainages (distance along the line of the projections of the
+            points) and offsets (signed distance to the line, positive on the left side)
+        :rtype: tuple
+        """
+
+        vertices = _as_xy(line)
+        a = vertices[:-1]
+        ab = np.diff(vertices, axis=0)
+        segment_lengths = np.hypot(ab[:, 0], ab[:, 1])
+        chainages = np.hstack([0., np.cumsum(segment_lengths)])
+
+        # samples spaced by at most distance along each segment, any point within distance of a segment lies within
+        # 1.5 * distance of one of its samples
+        n_samples = np.maximum(np.ceil(segment_lengths / distance).astype(int), 1) + 1
+        segments = np.repeat(np.arange(len(a)), n_samples)
+        t = np.arange(n_samples.sum()) - np.repeat(np.cumsum(n_samples) - n_samples, n_samples)
+        t = t / np.repeat(n_samples - 1, n_samples)
+        samples = a[segments] + t[:, None] * ab[segments]
+        pairs = cKDTree(samples).sparse_distance_matrix(self.tree, 1.5 * distance, output_type='ndarray')
+
+        # exact projection of the candidates on their segments, keeping the closest segment of each point
+        s, p = segments[pairs['i']], pairs['j']
+        ap = self.xy[p] - a[s]
+        t = np.clip(np.einsum('ij,ij->i', ap, ab[s]) / np.maximum(segment_lengths[s] ** 2, np.finfo(float).tiny),
+                    0., 1.)
+        d = np.hypot(*(ap - t[:, None] * ab[s]).T)
+        keep = d <= distance
+        s, p, t, d = s[keep], p[keep], t[keep], d[keep]
+        order = np.lexsort((d, p))
+        first = order[np.unique(p[order], return_index=True)[1]]
+        s, p, t, d = s[first], p[first], t[first], d[first]
+        side = np.sign(ab[s, 0] * (self.xy[p, 1] - a[s, 1]) - ab[s, 1] * (self.xy[p, 0] - a[s, 0]))
+        chainage = chainages[s] + t * segment_lengths[s]
+        order = np.argsort(chainage, kind='stable')
+        return p[order], chainage[order], (side * d)[order]
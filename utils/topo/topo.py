@@ -1,41 +1,219 @@
 import numpy as np
+from utils import instrumentation
 
+# characters separating degrees, minutes and seconds or giving the hemisphere in angles parsed by dms_to_dd
+_DMS_TABLE = str.maketrans({c: ' ' for c in '\u00b0\u00ba\'"\u2032\u2033:NSEWnsew+-'})
 
-def ddmm_to_dd(x):
+
+def _as_numeric(x):
+    """
+    Converts sequences to arrays, leaving scalars, arrays and array-like objects such as pandas Series untouched
+
+    x : `float`, `list`, `numpy.ndarray` or `pandas.Series`
+        values
+
+    Returns
+    -------
+    x : `float`, `numpy.ndarray` or `pandas.Series`
+        values supporting numpy ufuncs
+    """
+
+    if hasattr(x, '__array_ufunc__') or np.ndim(x) == 0:
+        return x
+    return np.asarray(x, dtype=float)
+
+
+def _as_str_array(x):
+    """
+    Converts strings or bytes to an array of strings
+
+    x : `str`, `bytes`, `list`, `numpy.ndarray` or `pandas.Series`
+        strings or bytes
+
+    Returns
+    -------
+    x : `numpy.ndarray`
+        array of stripped uppercase strings
+    """
+
+    x = np.asarray(x)
+    if x.dtype.kind == 'S':
+        x = np.char.decode(x, 'utf-8')
+    elif x.dtype.kind != 'U':
+        x = x.astype(str)
+    return np.char.upper(np.char.strip(x))
+
+
+def hemisphere_sign(hemisphere):
+    """
+    Gets the sign of angles from the hemisphere letters N, S, E or W
+
+    hemisphere : `str`, `bytes`, `list`, `numpy.ndarray` or `pandas.Series`
+                 hemisphere letters
+
+    Returns
+    -------
+    sign : `numpy.ndarray`
+           -1. for the southern and western hemispheres, 1. otherwise
+    """
+
+    h = _as_str_array(hemisphere)
+    return np.where((h == 'S') | (h == 'W'), -1., 1.)
+
+
+@instrumentation.instrument
+def ddmm_to_dd(x, hemisphere=None):
     """
     Converts angle expressed as degrees minutes (DDDMM) to decimal degrees (DDD.XXX)
 
-    x : `float`
-         angle in degrees minute
+    x : `float`, `numpy.ndarray` or `pandas.Series`
+         angle(s) in degrees minute, negative angles are converted to negative decimal degrees
+
+    hemisphere : `str`, `numpy.ndarray` or `pandas.Series`
+                 hemisphere letter(s) N, S, E or W giving the sign of the angle(s), the sign of x is then ignored
+                 (default: None)
+
+    Returns
+    -------
+    angle : `float`, `numpy.ndarray` or `pandas.Series`
+            angle(s) converted to the decimal degrees format
+    """
+
+    x = _as_numeric(x)
+    a = np.abs(x)
+    degrees = a // 100
+    minutes = a - 100. * degrees
+    if hemisphere is not None:
+        return (degrees + minutes / 60.) * hemisphere_sign(hemisphere)
+    return np.copysign(degrees + minutes / 60., x)
+
+
+@instrumentation.instrument
+def ddmmss_to_dd(x):
+    """
+    Converts angle expressed as degrees minutes seconds (DDDMMSS.SS) to decimal degrees (DDD.XXX)
+
+    x : `float`, `str`, `bytes`, `numpy.ndarray` or `pandas.Series`
+        angle(s) in degrees minutes seconds, as numbers or strings with an optional leading or trailing
+        hemisphere letter (e.g. '500829.04N')
+
+    Returns
+    -------
+    angle : `float` or `numpy.ndarray`
+            angle(s) converted to the decimal degrees format
+    """
+
+    if np.asarray(x).dtype.kind in 'SUO':
+        s = _as_str_array(x)
+        sign = np.where(np.char.startswith(s, 'S') | np.char.endswith(s, 'S')
+                        | np.char.startswith(s, 'W') | np.char.endswith(s, 'W'), -1., 1.)
+        x = np.char.strip(s, 'NSEW ').astype(float) * sign
+    x = _as_numeric(x)
+    a = np.abs(x)
+    degrees = a // 10000
+    minutes = (a - 10000. * degrees) // 100
+    seconds = a - 10000. * degrees - 100. * minutes
+    return np.copysign(degrees + minutes / 60. + seconds / 3600., x)
+
+
+@instrumentation.instrument
+def dms_to_dd(x):
+    """
+    Parses angles expressed as degrees, minutes and seconds strings such as 50°08'29.04"N, 50 08 29.04 S,
+    -5:11:06.2 or W 5 11 6.2 and converts them to decimal degrees
+
+    x : `str`, `bytes`, `list`, `numpy.ndarray` or `pandas.Series`
+        angle(s) with the degrees, minutes and seconds separated by spaces, colons or degree, minute and second
+        symbols, and with an optional sign or leading or trailing hemisphere letter
+
+    Returns
+    -------
+    angle : `float` or `numpy.ndarray`
+            angle(s) converted to the decimal degrees format
+    """
+
+    s = _as_str_array(x)
+    if s.size == 0:
+        return np.zeros(s.shape)
+    negative = (np.char.startswith(s, 'S') | np.char.endswith(s, 'S') | np.char.startswith(s, 'W')
+                | np.char.endswith(s, 'W') | np.char.startswith(s, '-'))
+    # the strings are translated at once, the fields of each string are counted from the starts of the runs of non
+    # white space characters between the NUL separators of the strings
+    text = '\0'.join(np.ravel(s).tolist()).translate(_DMS_TABLE)
+    chars = np.frombuffer((' ' + text).encode('utf-8'), dtype=np.uint8)
+    blank = np.isin(chars, np.frombuffer(b' \t\n\r\v\f\0', dtype=np.uint8))
+    starts = np.flatnonzero(~blank[1:] & blank[:-1]) + 1
+    counts = np.diff(np.searchsorted(starts, np.concatenate([[0], np.flatnonzero(chars == 0), [len(chars)]])))
+    if np.any(counts != 3):
+        raise ValueError('Expected degrees, minutes and seconds in each angle.')
+    fields = np.array(text.replace('\0', ' ').split(), dtype=float).reshape(-1, 3)
+    if np.any(fields[:, 1:] >= 60.):
+        raise ValueError('Minutes and seconds must be lower than 60.')
+    dd = (fields[:, 0] + fields[:, 1] / 60. + fields[:, 2] / 3600.).reshape(s.shape)
+    dd = np.where(negative, -dd, dd)
+    return dd if dd.ndim else float(dd)
+
+
+def _as_xy(p):
+    """
+    Gets the x and y coordinates of points
+
+    p : `shapely.geometry.Point` or `numpy.ndarray`
+        point or array of shape (2,) or (N, 2) of point coordinates
 
     Returns
     -------
-    angle : `float`
-            angle converted to the decimal degrees format
+    xy : `numpy.ndarray`
+         array of shape (2,) or (N, 2) of point coordinates
     """
 
-    degrees = float(x) // 100
-    minutes = x - 100. * degrees
-    return degrees + minutes/60.
+    if hasattr(p, 'coords'):
+        return np.asarray(p.coords[0][:2], dtype=float)
+    return np.asarray(p, dtype=float)[..., :2]
 
 
+@instrumentation.instrument
 def azimuth(origin, target):
     """
-    Computes the Azimuth of a target point as seen from a origin point
+    Computes the Azimuth of target points as seen from origin points
+
+    Origins and targets are broadcast against each other, so that the azimuths of pairs of points, of many targets
+    from one origin or of one target from many origins are computed in one call.
 
     Parameters
     ----------
-    origin : `shapely.geometry.Point`
-             Point from which the target is observed
+    origin : `shapely.geometry.Point` or `numpy.ndarray`
+             Point(s) from which the target is observed, as a Point or an array of shape (2,) or (N, 2)
 
-    target : `shapely.geometry.Point`
-             Point which is observed from the origin
+    target : `shapely.geometry.Point` or `numpy.ndarray`
+             Point(s) which are observed from the origin, as a Point or an array of shape (2,) or (N, 2)
     Returns
     -------
-    azimuth: `float`
-             azimuth angle in radians
+    azimuth: `float` or `numpy.ndarray`
+             azimuth angle(s) in radians in [0, 2pi)
 
     """
-    az = np.arctan2(target.coords[0][0] - origin.coords[0][0], target.coords[0][1] - origin.coords[0][1])
+    d = _as_xy(target) - _as_xy(origin)
+    az = np.arctan2(d[..., 0], d[..., 1])
     az = np.fmod(az + 2 * np.pi, 2 * np.pi)
     return az
+
+
+@instrumentation.instrument
+def track_azimuths(xy):
+    """
+    Computes the Azimuth of each segment along a track
+
+    Parameters
+    ----------
+    xy : `numpy.ndarray`
+         array of shape (N, 2) of the coordinates of the vertices of the track
+
+    Returns
+    -------
+    azimuths: `numpy.ndarray`
+              array of shape (N-1,) of the azimuth angles of the segments in radians in [0, 2pi)
+
+    """
+    xy = _as_xy(xy)
+    return azimuth(xy[:-1], xy[1:])